@@ -0,0 +1,31 @@
+"""Add rolling summary columns to sessions
+
+Revision ID: 3b8e1f6c9d2a
+Revises: fc94b2a22a41
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3b8e1f6c9d2a"
+down_revision: Union[str, None] = "fc94b2a22a41"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("sessions", sa.Column("summary", sa.Text(), nullable=True))
+    op.add_column(
+        "sessions", sa.Column("summary_through_id", sa.Integer(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sessions", "summary_through_id")
+    op.drop_column("sessions", "summary")
@@ -0,0 +1,27 @@
+"""Add status column to chat_messages
+
+Revision ID: 7c2d4e9a1f35
+Revises: 3b8e1f6c9d2a
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c2d4e9a1f35"
+down_revision: Union[str, None] = "3b8e1f6c9d2a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("status", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_messages", "status")
@@ -0,0 +1,38 @@
+"""Add idempotency_key column to chat_messages
+
+Revision ID: 9e4a6b2c8d17
+Revises: 7c2d4e9a1f35
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9e4a6b2c8d17"
+down_revision: Union[str, None] = "7c2d4e9a1f35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "chat_messages", sa.Column("idempotency_key", sa.String(), nullable=True)
+    )
+    op.create_index(
+        "ix_chat_messages_session_id_idempotency_key",
+        "chat_messages",
+        ["session_id", "idempotency_key"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_chat_messages_session_id_idempotency_key", table_name="chat_messages"
+    )
+    op.drop_column("chat_messages", "idempotency_key")
@@ -0,0 +1,71 @@
+"""Use JSONB with GIN indexes for JSON columns on PostgreSQL
+
+Revision ID: a4d9e2f7c610
+Revises: e7c3a9d1b284
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a4d9e2f7c610"
+down_revision: Union[str, None] = "e7c3a9d1b284"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+JSON_COLUMNS = [
+    ("case_studies", "learning_objectives"),
+    ("case_studies", "context_materials"),
+    ("case_studies", "checkpoints"),
+    ("case_studies", "pitfalls"),
+    ("sessions", "completed_checkpoints"),
+]
+
+GIN_INDEXES = [
+    ("ix_case_studies_checkpoints", "case_studies", "checkpoints"),
+    ("ix_case_studies_context_materials", "case_studies", "context_materials"),
+    ("ix_sessions_completed_checkpoints", "sessions", "completed_checkpoints"),
+]
+
+
+def upgrade() -> None:
+    # SQLite keeps storing JSON as text
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table, column in JSON_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=postgresql.JSONB(),
+            existing_type=sa.JSON(),
+            postgresql_using=f"{column}::jsonb",
+        )
+    for name, table, column in GIN_INDEXES:
+        op.create_index(
+            name,
+            table,
+            [column],
+            postgresql_using="gin",
+            postgresql_ops={column: "jsonb_path_ops"},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for name, table, _ in GIN_INDEXES:
+        op.drop_index(name, table_name=table)
+    for table, column in JSON_COLUMNS:
+        op.alter_column(
+            table,
+            column,
+            type_=sa.JSON(),
+            existing_type=postgresql.JSONB(),
+            postgresql_using=f"{column}::json",
+        )
@@ -0,0 +1,50 @@
+"""Add opening_messages table
+
+Revision ID: b5f1c3d7e920
+Revises: 9e4a6b2c8d17
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b5f1c3d7e920"
+down_revision: Union[str, None] = "9e4a6b2c8d17"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "opening_messages",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("case_study_id", sa.Integer(), nullable=False),
+        sa.Column("checkpoint_id", sa.String(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("case_study_updated", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["case_study_id"],
+            ["case_studies.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_opening_messages_case_study_id_checkpoint_id",
+        "opening_messages",
+        ["case_study_id", "checkpoint_id"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_opening_messages_case_study_id_checkpoint_id",
+        table_name="opening_messages",
+    )
+    op.drop_table("opening_messages")
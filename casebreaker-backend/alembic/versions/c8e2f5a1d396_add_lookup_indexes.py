@@ -0,0 +1,49 @@
+"""Add indexes for foreign keys and hot lookups
+
+Revision ID: c8e2f5a1d396
+Revises: a4d9e2f7c610
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e2f5a1d396"
+down_revision: Union[str, None] = "a4d9e2f7c610"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+STREAMING = sa.text("status = 'streaming'")
+
+
+def upgrade() -> None:
+    op.create_index("ix_subtopics_field_id", "subtopics", ["field_id"])
+    op.create_index("ix_case_studies_subtopic_id", "case_studies", ["subtopic_id"])
+    op.create_index("ix_sessions_case_study_id", "sessions", ["case_study_id"])
+    op.create_index("ix_sessions_device_id", "sessions", ["device_id"])
+    op.create_index(
+        "ix_chat_messages_session_id_id", "chat_messages", ["session_id", "id"]
+    )
+    op.create_index("ix_chat_messages_timestamp", "chat_messages", ["timestamp"])
+    op.create_index(
+        "ix_chat_messages_streaming",
+        "chat_messages",
+        ["status"],
+        sqlite_where=STREAMING,
+        postgresql_where=STREAMING,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_messages_streaming", table_name="chat_messages")
+    op.drop_index("ix_chat_messages_timestamp", table_name="chat_messages")
+    op.drop_index("ix_chat_messages_session_id_id", table_name="chat_messages")
+    op.drop_index("ix_sessions_device_id", table_name="sessions")
+    op.drop_index("ix_sessions_case_study_id", table_name="sessions")
+    op.drop_index("ix_case_studies_subtopic_id", table_name="case_studies")
+    op.drop_index("ix_subtopics_field_id", table_name="subtopics")
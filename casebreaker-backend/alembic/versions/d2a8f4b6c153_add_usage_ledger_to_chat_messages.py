@@ -0,0 +1,40 @@
+"""Add usage ledger columns to chat_messages
+
+Revision ID: d2a8f4b6c153
+Revises: b5f1c3d7e920
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2a8f4b6c153"
+down_revision: Union[str, None] = "b5f1c3d7e920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+USAGE_COLUMNS = [
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+    "ttft_ms",
+    "duration_ms",
+]
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("model", sa.String(), nullable=True))
+    for column in USAGE_COLUMNS:
+        op.add_column("chat_messages", sa.Column(column, sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    for column in reversed(USAGE_COLUMNS):
+        op.drop_column("chat_messages", column)
+    op.drop_column("chat_messages", "model")
@@ -0,0 +1,27 @@
+"""Add route column to chat_messages
+
+Revision ID: e7c3a9d1b284
+Revises: d2a8f4b6c153
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7c3a9d1b284"
+down_revision: Union[str, None] = "d2a8f4b6c153"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("chat_messages", sa.Column("route", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("chat_messages", "route")
@@ -0,0 +1,35 @@
+"""Add case_count to subtopics
+
+Revision ID: f3b7d9e1a542
+Revises: c8e2f5a1d396
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f3b7d9e1a542"
+down_revision: Union[str, None] = "c8e2f5a1d396"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "subtopics",
+        sa.Column("case_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        "UPDATE subtopics SET case_count = ("
+        "SELECT count(*) FROM case_studies "
+        "WHERE case_studies.subtopic_id = subtopics.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("subtopics", "case_count")
@@ -0,0 +1,115 @@
+"""
+Benchmark how many concurrent chat streams a single event loop can serve.
+
+Compares the old pattern (a blocking iterator consumed inside an async
+generator) with the async provider path used by ClaudeService. The upstream
+model is simulated with a fixed per-token delay (FakeProvider on the async
+side), so no API key is required.
+
+Usage:
+    poetry run python benchmarks/concurrent_streams.py --tokens 50 --delay 0.02
+"""
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from casebreaker_backend.services.claude import ClaudeService
+from casebreaker_backend.services.providers import FakeProvider
+
+
+def _delta(text):
+    return SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=text))
+
+
+class BlockingStream:
+    """Mimics the synchronous anthropic stream: every token wait blocks."""
+
+    def __init__(self, tokens, delay):
+        self.tokens = tokens
+        self.delay = delay
+
+    def __iter__(self):
+        for i in range(self.tokens):
+            time.sleep(self.delay)
+            yield _delta(f"tok{i} ")
+
+
+async def blocking_stream(tokens, delay):
+    """The pre-async generate_response loop."""
+    for chunk in BlockingStream(tokens, delay):
+        yield chunk.delta.text
+
+
+async def async_stream(service):
+    async for event in service.generate_response(
+        messages=[{"role": "user", "content": "hello"}],
+        case_study={"title": "Benchmark"},
+    ):
+        yield event
+
+
+async def measure_lag(stop, samples, interval=0.01):
+    """Record how late the event loop wakes up a periodic ticker."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def run(mode, concurrency, tokens, delay):
+    service = ClaudeService(
+        provider=FakeProvider(
+            response="tok ",
+            output_tokens=tokens,
+            tokens_per_second=1 / delay,
+            ttft_ms=delay * 1000,
+        )
+    )
+
+    async def consume():
+        stream = (
+            blocking_stream(tokens, delay) if mode == "blocking" else async_stream(service)
+        )
+        async for _ in stream:
+            pass
+
+    stop = asyncio.Event()
+    lag = []
+    ticker = asyncio.create_task(measure_lag(stop, lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(consume() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return elapsed, max(lag, default=0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.02, help="seconds per token")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=2.0,
+        help="a stream is 'served' if it finishes within budget x its ideal duration",
+    )
+    args = parser.parse_args()
+
+    ideal = args.tokens * args.delay
+    print(f"ideal stream duration: {ideal:.2f}s ({args.tokens} tokens @ {args.delay}s)")
+    print(f"{'mode':<10}{'streams':>9}{'wall (s)':>11}{'max lag (s)':>13}{'served':>8}")
+    for mode in ("blocking", "async"):
+        for concurrency in args.concurrency:
+            elapsed, lag = asyncio.run(run(mode, concurrency, args.tokens, args.delay))
+            served = "yes" if elapsed <= ideal * args.budget else "no"
+            print(f"{mode:<10}{concurrency:>9}{elapsed:>11.2f}{lag:>13.3f}{served:>8}")
+            if mode == "blocking" and served == "no":
+                # Serialised streams only get slower from here on.
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Concurrent load test for POST /sessions/{id}/messages.
+
+By default this starts its own uvicorn worker against a throwaway SQLite
+database and the fake LLM provider, seeds one case study, then runs N virtual
+students concurrently, each sending a few messages and reading the SSE stream
+to the end. Pass --base-url and --case-study-id to target a running server
+instead.
+
+Results are printed and written as JSON so two runs can be compared:
+
+    poetry run python benchmarks/load_test.py --sessions 200 --output new.json
+    poetry run python benchmarks/load_test.py --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from casebreaker_backend.models import Base, Field, Subtopic, CaseStudy
+from casebreaker_backend.services.metrics import percentile
+
+API = "/api/v1"
+
+
+def seed_database(database_url):
+    """Create the schema and a single case study to chat about."""
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    field = Field(name="Load Test", description="Synthetic field")
+    subtopic = Subtopic(name="Load Test", description="Synthetic subtopic", field=field)
+    case_study = CaseStudy(
+        subtopic=subtopic,
+        title="Load Test Case",
+        description="Synthetic case study for load testing",
+        difficulty=3,
+        specialization="Load",
+        learning_objectives=["Stay responsive under load"],
+        context_materials={
+            "cards": [
+                {"title": f"Card {i}", "description": "Background material. " * 20}
+                for i in range(5)
+            ]
+        },
+        checkpoints=[
+            {"id": str(i), "title": f"Checkpoint {i}", "description": "Reason it out"}
+            for i in range(1, 6)
+        ],
+        pitfalls=[],
+        source_type="GENERATED",
+        share_slug="load-test-case",
+        estimated_time=30,
+    )
+    db.add(case_study)
+    db.commit()
+    case_study_id = case_study.id
+    db.close()
+    engine.dispose()
+    return case_study_id
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, database_url):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        LLM_PROVIDER="fake",
+        FAKE_LLM_OUTPUT_TOKENS=str(args.tokens),
+        FAKE_LLM_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        FAKE_LLM_TTFT_MS=str(args.ttft_ms),
+    )
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "casebreaker_backend.main:app",
+            "--port",
+            str(port),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/").status_code == 200:
+                return server, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("server did not start within 30s")
+
+
+async def send_message(client, session_id, content):
+    """Post one message and read the stream, returning its timings."""
+    result = {"ok": False, "tokens": 0, "ttfb": None, "first_token": None}
+    start = time.perf_counter()
+    try:
+        async with client.stream(
+            "POST",
+            f"{API}/sessions/{session_id}/messages",
+            json={"role": "user", "content": content},
+        ) as response:
+            result["ttfb"] = time.perf_counter() - start
+            if response.status_code != 200:
+                result["error"] = f"HTTP {response.status_code}"
+                return result
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: ") and event == "chunk":
+                    if result["first_token"] is None:
+                        result["first_token"] = time.perf_counter() - start
+                    result["tokens"] += 1
+                elif line.startswith("data: ") and event == "error":
+                    result["error"] = json.loads(line[6:])["data"]
+        result["ok"] = "error" not in result
+    except httpx.HTTPError as e:
+        result["error"] = repr(e)
+    result["duration"] = time.perf_counter() - start
+    return result
+
+
+async def virtual_student(client, case_study_id, index, messages):
+    try:
+        response = await client.post(
+            f"{API}/sessions/",
+            json={"case_study_id": case_study_id, "device_id": f"load-test-{index}"},
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        # Count every message this student would have sent as failed
+        return [{"ok": False, "tokens": 0, "error": repr(e)}] * messages
+    session_id = response.json()["id"]
+    return [
+        await send_message(client, session_id, f"Student {index}, message {turn}")
+        for turn in range(messages)
+    ]
+
+
+def summarize(results, wall_time, server_metrics):
+    ok = [r for r in results if r["ok"]]
+    durations = [r["duration"] for r in ok]
+    ttfb = [r["ttfb"] for r in ok]
+    first_token = [r["first_token"] for r in ok if r["first_token"] is not None]
+    rates = [
+        r["tokens"] / (r["duration"] - r["first_token"])
+        for r in ok
+        if r["first_token"] is not None and r["duration"] > r["first_token"]
+    ]
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": (len(results) - len(ok)) / len(results) if results else 0.0,
+        "wall_time": wall_time,
+        "aggregate_tokens_per_second": sum(r["tokens"] for r in ok) / wall_time,
+    }
+    for name, values in (
+        ("ttfb", ttfb),
+        ("first_token", first_token),
+        ("stream_duration", durations),
+        ("tokens_per_second", rates),
+    ):
+        for q in (50, 95, 99):
+            summary[f"{name}_p{q}"] = percentile(values, q)
+
+    db_write = (server_metrics or {}).get("timings", {}).get("db_write")
+    if db_write:
+        for q in (50, 95, 99):
+            summary[f"db_write_p{q}"] = db_write[f"p{q}"]
+    return summary
+
+
+async def run(args, base_url, case_study_id):
+    limits = httpx.Limits(max_connections=args.sessions, max_keepalive_connections=0)
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=args.timeout, limits=limits
+    ) as client:
+        start = time.perf_counter()
+        per_student = await asyncio.gather(
+            *(
+                virtual_student(client, case_study_id, i, args.messages)
+                for i in range(args.sessions)
+            )
+        )
+        wall_time = time.perf_counter() - start
+        response = await client.get(f"{API}/metrics/")
+        server_metrics = response.json() if response.status_code == 200 else None
+    results = [result for student in per_student for result in student]
+    return summarize(results, wall_time, server_metrics), server_metrics
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)["summary"]
+    with open(new_path) as f:
+        new = json.load(f)["summary"]
+    print(f"{'metric':<32}{'old':>12}{'new':>12}{'change':>10}")
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        change = ""
+        if before and after is not None:
+            change = f"{(after - before) / before:+.1%}"
+        fmt = lambda v: "-" if v is None else f"{v:.4g}"
+        print(f"{key:<32}{fmt(before):>12}{fmt(after):>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent students")
+    parser.add_argument("--messages", type=int, default=3, help="messages per student")
+    parser.add_argument("--tokens", type=int, default=60, help="fake tokens per reply")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--ttft-ms", type=int, default=300)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--base-url", help="target a running server instead")
+    parser.add_argument("--case-study-id", type=int, help="required with --base-url")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    server = None
+    tmpdir = None
+    if args.base_url:
+        if args.case_study_id is None:
+            parser.error("--case-study-id is required with --base-url")
+        base_url, case_study_id = args.base_url, args.case_study_id
+    else:
+        tmpdir = tempfile.TemporaryDirectory()
+        database_url = f"sqlite:///{tmpdir.name}/load_test.db"
+        case_study_id = seed_database(database_url)
+        server, base_url = start_server(args, database_url)
+
+    try:
+        summary, server_metrics = asyncio.run(run(args, base_url, case_study_id))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    for key, value in summary.items():
+        print(f"{key:<32}{value:>12.4g}")
+
+    if args.output:
+        config = {k: v for k, v in vars(args).items() if k not in ("output", "compare")}
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "config": config,
+                    "summary": summary,
+                    "server_metrics": server_metrics,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
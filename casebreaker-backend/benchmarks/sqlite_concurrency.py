@@ -0,0 +1,202 @@
+"""
+Benchmark SQLite writer and reader throughput under mixed chat load.
+
+Simulates what concurrent chat streams do to the database: every stream saves
+its user message, rewrites its assistant reply every --save-interval seconds
+and marks a checkpoint, while readers poll the conversation and the session
+list. Runs once with SQLAlchemy's defaults (rollback journal, pool of 5 + 10)
+and once with the settings-driven profile from database.py (WAL, pragmas and
+DB_POOL_* sizing), against a throwaway database file, through the same async
+engine the API uses.
+
+Usage:
+    poetry run python benchmarks/sqlite_concurrency.py --streams 30 --readers 30
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from casebreaker_backend.database import (
+    async_database_url,
+    create_async_database_engine,
+    sqlite_pragmas,
+)
+from casebreaker_backend.models import (
+    Base,
+    CaseStudy,
+    ChatMessage,
+    Field,
+    Session,
+    Subtopic,
+)
+from casebreaker_backend.services.metrics import percentile
+
+
+def seed_database(database_url, sessions):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    field = Field(name="Benchmark", description="Synthetic field")
+    subtopic = Subtopic(name="Benchmark", description="Synthetic", field=field)
+    case_study = CaseStudy(
+        subtopic=subtopic,
+        title="Benchmark Case",
+        difficulty=3,
+        checkpoints=[{"id": str(i), "title": f"Checkpoint {i}"} for i in range(5)],
+        share_slug="benchmark-case",
+        estimated_time=30,
+    )
+    db.add_all(
+        Session(case_study=case_study, device_id=f"device-{i}", completed_checkpoints=[])
+        for i in range(sessions)
+    )
+    db.commit()
+    session_ids = [row.id for row in db.query(Session.id)]
+    db.close()
+    engine.dispose()
+    return session_ids
+
+
+class Stats:
+    def __init__(self):
+        self.write_ms = []
+        self.read_ms = []
+        self.errors = {}
+
+    def error(self, e):
+        name = type(e).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def timed(samples, stats, operation):
+    started = time.perf_counter()
+    try:
+        await operation()
+    except Exception as e:
+        stats.error(e)
+        return
+    samples.append((time.perf_counter() - started) * 1000)
+
+
+async def chat_stream(SessionLocal, session_id, args, stats, stop):
+    """One student: post, stream a reply with periodic saves, tick a checkpoint."""
+    while not stop.is_set():
+        async with SessionLocal() as db:
+
+            async def post():
+                db.add(ChatMessage(session_id=session_id, role="user", content="Why?"))
+                await db.commit()
+
+            await timed(stats.write_ms, stats, post)
+            reply = ChatMessage(
+                session_id=session_id,
+                role="assistant",
+                content="",
+                status="streaming",
+                timestamp=datetime.utcnow(),
+            )
+            db.add(reply)
+            for update in range(args.saves_per_reply):
+                reply.content += "Consider the history first. " * 4
+                reply.status = (
+                    "complete" if update == args.saves_per_reply - 1 else "streaming"
+                )
+                await timed(stats.write_ms, stats, db.commit)
+                await asyncio.sleep(args.save_interval)
+
+            async def checkpoint():
+                session = await db.get(Session, session_id)
+                session.completed_checkpoints = [
+                    *session.completed_checkpoints,
+                    str(random.randrange(5)),
+                ]
+                await db.commit()
+
+            await timed(stats.write_ms, stats, checkpoint)
+
+
+async def reader(SessionLocal, session_ids, args, stats, stop):
+    """A client reloading a conversation or its session list."""
+    while not stop.is_set():
+        session_id = random.choice(session_ids)
+
+        async def read():
+            async with SessionLocal() as db:
+                await db.get(Session, session_id)
+                messages = await db.scalars(
+                    select(ChatMessage).where(ChatMessage.session_id == session_id)
+                )
+                messages.all()
+
+        await timed(stats.read_ms, stats, read)
+        await asyncio.sleep(args.read_interval)
+
+
+async def run(engine, session_ids, args):
+    SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    stats = Stats()
+    stop = asyncio.Event()
+    tasks = [
+        asyncio.create_task(chat_stream(SessionLocal, session_id, args, stats, stop))
+        for session_id in session_ids[: args.streams]
+    ] + [
+        asyncio.create_task(reader(SessionLocal, session_ids, args, stats, stop))
+        for _ in range(args.readers)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    await engine.dispose()
+    return stats
+
+
+def report(name, stats, duration):
+    print(
+        f"{name:>8}{len(stats.write_ms) / duration:>10.0f}"
+        f"{percentile(stats.write_ms, 50):>10.1f}{percentile(stats.write_ms, 95):>10.1f}"
+        f"{len(stats.read_ms) / duration:>10.0f}"
+        f"{percentile(stats.read_ms, 50):>10.1f}{percentile(stats.read_ms, 95):>10.1f}"
+        f"   {stats.errors or '-'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=30)
+    parser.add_argument("--readers", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--saves-per-reply", type=int, default=5)
+    parser.add_argument("--save-interval", type=float, default=0.05)
+    parser.add_argument("--read-interval", type=float, default=0.01)
+    args = parser.parse_args()
+
+    print(f"Tuned profile pragmas: {sqlite_pragmas()}")
+    print(
+        f"{args.streams} streams, {args.readers} readers, {args.duration:g}s each\n"
+        f"{'profile':>8}{'writes/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+        f"{'reads/s':>10}{'p50 ms':>10}{'p95 ms':>10}   errors"
+    )
+    profiles = {
+        "default": lambda url: create_async_engine(
+            async_database_url(url), connect_args={"check_same_thread": False}
+        ),
+        "tuned": create_async_database_engine,
+    }
+    for name, make_engine in profiles.items():
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+            session_ids = seed_database(url, max(args.streams, 1))
+            stats = asyncio.run(run(make_engine(url), session_ids, args))
+            report(name, stats, args.duration)
+
+
+if __name__ == "__main__":
+    main()
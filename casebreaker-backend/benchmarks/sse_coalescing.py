@@ -0,0 +1,86 @@
+"""
+Benchmark of SSE frames per response and CPU per stream with delta coalescing.
+
+Runs --streams concurrent responses from the fake provider, paced at
+--tokens-per-second, through coalesce_deltas and SSE encoding, once per
+window in --windows (0 sends one frame per delta). Reports frames and bytes
+per response, CPU time per stream and the added delivery delay of the last
+token.
+
+Usage:
+    poetry run python benchmarks/sse_coalescing.py --streams 300 --windows 0 30 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from casebreaker_backend.services.coalesce import coalesce_deltas
+from casebreaker_backend.services.providers import FakeProvider
+
+MESSAGES = [{"role": "user", "content": "What happened here?"}]
+
+
+async def one_stream(provider, window_ms, max_bytes):
+    frames = 0
+    size = 0
+    last_frame_at = None
+    loop = asyncio.get_running_loop()
+    events = provider.stream("system", MESSAGES, model="fake", max_tokens=4096)
+    async for event in coalesce_deltas(events, window_ms, max_bytes):
+        frame = event.to_sse()
+        frames += 1
+        size += len(frame)
+        last_frame_at = loop.time()
+    return frames, size, last_frame_at
+
+
+async def run(streams, window_ms, max_bytes, provider):
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    cpu_start = time.process_time()
+    results = await asyncio.gather(
+        *(one_stream(provider, window_ms, max_bytes) for _ in range(streams))
+    )
+    cpu = time.process_time() - cpu_start
+    finished = [last_frame_at - started for _, _, last_frame_at in results]
+    return {
+        "frames": statistics.mean(frames for frames, _, _ in results),
+        "bytes": statistics.mean(size for _, size, _ in results),
+        "cpu_ms": cpu / streams * 1000,
+        "duration": statistics.mean(finished),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=300)
+    parser.add_argument("--tokens", type=int, default=400)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 30, 100])
+    parser.add_argument("--max-bytes", type=int, default=256)
+    args = parser.parse_args()
+
+    provider = FakeProvider(
+        response="Consider the patient's history before the lab results arrive.",
+        output_tokens=args.tokens,
+        tokens_per_second=args.tokens_per_second,
+    )
+    print(
+        f"{args.streams} streams x {args.tokens} tokens at "
+        f"{args.tokens_per_second:g} tokens/s, max {args.max_bytes} bytes per frame"
+    )
+    print(
+        f"{'window ms':>10}{'frames/resp':>13}{'bytes/resp':>12}"
+        f"{'cpu ms/stream':>15}{'duration s':>12}"
+    )
+    for window_ms in args.windows:
+        result = asyncio.run(run(args.streams, window_ms, args.max_bytes, provider))
+        print(
+            f"{window_ms:>10g}{result['frames']:>13.1f}{result['bytes']:>12.0f}"
+            f"{result['cpu_ms']:>15.2f}{result['duration']:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Micro-benchmark of per-token overhead on the chat streaming path.
+
+"legacy" reproduces the old pipeline: the service JSON-encodes every delta to
+SSE, then the router splits the frame, strips "data: " and json.loads it again
+to recover the text before re-emitting it. "typed" is the current pipeline: the
+service yields a TextDelta and the router encodes it to SSE once.
+
+Usage:
+    poetry run python benchmarks/sse_overhead.py --tokens 100000
+"""
+import argparse
+import json
+import time
+
+from casebreaker_backend.services.events import TextDelta, format_sse
+
+
+def legacy(deltas):
+    for text in deltas:
+        chunk = format_sse({"type": "chunk", "data": text}, "chunk")
+        lines = chunk.strip().split("\n")
+        data_line = next((line for line in lines if line.startswith("data: ")), None)
+        data = json.loads(data_line.replace("data: ", "", 1).strip())
+        if data["type"] == "chunk":
+            yield format_sse({"type": "chunk", "data": data["data"]}, "chunk")
+
+
+def typed(deltas):
+    for text in deltas:
+        event = TextDelta(text)
+        if isinstance(event, TextDelta):
+            yield TextDelta(event.text).to_sse()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    deltas = [f" tok{i % 97}" for i in range(args.tokens)]
+    assert list(legacy(deltas[:10])) == list(typed(deltas[:10]))
+
+    print(f"{'pipeline':<10}{'ns/token':>12}")
+    for name, pipeline in (("legacy", legacy), ("typed", typed)):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            for _ in pipeline(deltas):
+                pass
+            best = min(best, time.perf_counter() - start)
+        print(f"{name:<10}{best / args.tokens * 1e9:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
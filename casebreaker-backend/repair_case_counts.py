@@ -0,0 +1,45 @@
+"""
+Recompute every subtopic's stored case_count from the case_studies table.
+
+The counter is maintained when case studies are created, moved and deleted
+through the ORM; run this after changing case_studies with raw SQL or bulk
+inserts, or to check a database for drift.
+
+Usage:
+    poetry run python repair_case_counts.py
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from casebreaker_backend.database import SessionLocal
+from casebreaker_backend.models import CaseStudy, Subtopic
+
+
+def repair_case_counts(db: Session) -> int:
+    """Correct every subtopic whose case_count has drifted; returns how many."""
+    actual = (
+        select(func.count(CaseStudy.id))
+        .where(CaseStudy.subtopic_id == Subtopic.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(Subtopic)
+        .where(Subtopic.case_count != actual)
+        .values(case_count=actual)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def main():
+    db = SessionLocal()
+    try:
+        repaired = repair_case_counts(db)
+        print(f"Repaired case_count on {repaired} subtopics")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
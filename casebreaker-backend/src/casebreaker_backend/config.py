@@ -1,12 +1,116 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Any, Dict, List
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./casebreaker.db"
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "CaseBreaker"
-    CLAUDE_API_KEY: str
-    
+
+    # Connection pool per engine (ignored for in-memory SQLite). SQLite runs
+    # one writer at a time, so a much larger pool mostly adds connections
+    # waiting on busy_timeout; see benchmarks/sqlite_concurrency.py
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+
+    # SQLite pragmas set on every new connection. WAL lets readers run while
+    # a reply is being saved, and busy_timeout makes writers wait for the
+    # lock instead of failing with "database is locked". cache_size is in
+    # KiB (negative, as SQLite expects); an empty journal mode or 0 keeps
+    # SQLite's default
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
+    # LLM provider: "anthropic" or "fake" (offline, deterministic)
+    LLM_PROVIDER: str = "anthropic"
+    CLAUDE_API_KEY: str | None = None
+    CLAUDE_MODEL: str = "claude-3-opus-20240229"
+    CLAUDE_MAX_TOKENS: int = 4096
+    # Mark the system prompt for provider-side prompt caching
+    PROMPT_CACHING: bool = True
+
+    # Per-turn model routing: the first rule whose conditions all hold picks
+    # the model and optionally max_tokens, otherwise CLAUDE_MODEL and
+    # CLAUDE_MAX_TOKENS are used. Conditions: max/min_message_chars,
+    # max/min_difficulty, max/min_remaining_checkpoints and min_queue_length.
+    # Set as JSON in the environment; [] always uses the default model. A
+    # lower max_tokens can cut replies short, dropping a trailing checkpoint
+    # marker; such replies are saved as truncated.
+    MODEL_ROUTING_RULES: List[Dict[str, Any]] = [
+        {
+            "name": "queue_pressure",
+            "model": "claude-3-5-haiku-20241022",
+            "when": {"min_queue_length": 32},
+        },
+        {
+            "name": "short_nudge",
+            "model": "claude-3-5-haiku-20241022",
+            "when": {"max_message_chars": 120, "max_difficulty": 3},
+        },
+        {
+            "name": "wrap_up",
+            "model": "claude-3-5-haiku-20241022",
+            "when": {"max_remaining_checkpoints": 0},
+        },
+    ]
+
+    # Answer "DEUS-<id>" admin commands server-side, without a model call.
+    # For testing and QA only; keep disabled in production
+    ADMIN_COMMANDS: bool = False
+
+    # Allow POST /case-studies/openings/prewarm, which generates every missing
+    # opening message in the background. Enable it only where the endpoint is
+    # not publicly reachable
+    OPENING_PREWARM: bool = False
+
+    # Admission control for concurrent LLM calls (per worker)
+    LLM_MAX_CONCURRENT: int = 64
+    LLM_MAX_QUEUE: int = 256
+    LLM_MAX_PER_DEVICE: int = 1
+
+    # Resumable chat streams: events kept per in-flight response, how long an
+    # abandoned response keeps generating, and how long a finished one stays
+    # replayable
+    STREAM_RESUME_BUFFER: int = 512
+    STREAM_RESUME_GRACE_SECONDS: float = 5.0
+    STREAM_RESUME_TTL_SECONDS: float = 60.0
+
+    # Keep-alive interval for idle progress subscriptions
+    PROGRESS_HEARTBEAT_SECONDS: float = 15.0
+
+    # How often a streaming assistant reply is written to the database
+    STREAM_SAVE_INTERVAL_SECONDS: float = 1.0
+
+    # Merge text deltas into one SSE frame per SSE_COALESCE_MS window or
+    # SSE_COALESCE_BYTES of text, whichever comes first; 0 sends every delta
+    SSE_COALESCE_MS: int = 0
+    SSE_COALESCE_BYTES: int = 256
+
+    # Conversation window: the last CONTEXT_RECENT_TURNS turns are sent
+    # verbatim and older turns are folded into a rolling summary, in batches
+    # of CONTEXT_SUMMARY_EVERY_TURNS, within CONTEXT_TOKEN_BUDGET tokens
+    CONTEXT_RECENT_TURNS: int = 8
+    CONTEXT_SUMMARY_EVERY_TURNS: int = 4
+    CONTEXT_TOKEN_BUDGET: int = 6000
+    # Case studies with more context cards than this only send the cards
+    # that best match the current checkpoint and message; 0 sends them all
+    CONTEXT_MAX_CARDS: int = 6
+    SUMMARY_MODEL: str = "claude-3-haiku-20240307"
+    SUMMARY_MAX_TOKENS: int = 400
+
+    # Fake provider, for load tests and offline development
+    FAKE_LLM_RESPONSE: str = (
+        "Let's work through this together. You said: \"{last_message}\". "
+        "What evidence in the case supports that, and what might contradict it?"
+    )
+    FAKE_LLM_OUTPUT_TOKENS: int = 60
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50.0
+    FAKE_LLM_TTFT_MS: int = 300
+
     class Config:
         env_file = ".env"
 
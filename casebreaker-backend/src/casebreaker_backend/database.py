@@ -1,18 +1,100 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from .config import get_settings
 from .models import Base
 
 settings = get_settings()
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Async driver for each database DATABASE_URL may point at
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+# Sync driver when DATABASE_URL names none; the default for postgresql://
+# changed to psycopg 3 in SQLAlchemy 2.1, the postgres extra installs psycopg2
+SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2"}
+
+
+def sync_database_url(url: str) -> str:
+    """url with the installed sync driver, e.g. postgresql:// -> postgresql+psycopg2://"""
+    parsed = make_url(url)
+    driver = SYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def async_database_url(url: str) -> str:
+    """The same database with its async driver, e.g. sqlite:// -> sqlite+aiosqlite://"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Driver and pool options for an engine on url, from settings."""
+    options: Dict[str, Any] = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        if make_url(url).database in (None, "", ":memory:"):
+            # In-memory databases live in a single connection, so no pool
+            return options
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    )
+    return options
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    """The SQLite pragmas set on every new connection."""
+    pragmas = {
+        "journal_mode": settings.SQLITE_JOURNAL_MODE,
+        "synchronous": settings.SQLITE_SYNCHRONOUS,
+        "busy_timeout": settings.SQLITE_BUSY_TIMEOUT_MS,
+        "cache_size": settings.SQLITE_CACHE_SIZE,
+        "mmap_size": settings.SQLITE_MMAP_SIZE,
+    }
+    return {name: value for name, value in pragmas.items() if value}
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def create_database_engine(url: str) -> Engine:
+    engine = create_engine(sync_database_url(url), **engine_options(url))
+    if is_sqlite(url):
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+def create_async_database_engine(url: str) -> AsyncEngine:
+    engine = create_async_engine(async_database_url(url), **engine_options(url))
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+# Sync engine for scripts such as seed_data.py
+engine = create_database_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_db():
-    db = SessionLocal()
-    try:
+# The API talks to the database through the async engine, so waiting on a
+# query never blocks the event loop or ties up a worker thread
+async_engine = create_async_database_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
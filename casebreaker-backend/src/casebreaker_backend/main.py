@@ -1,14 +1,41 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .config import get_settings
-from .routers import fields_router, subtopics_router, case_studies_router, sessions_router
+from .database import AsyncSessionLocal, async_engine
+from .routers import (
+    fields_router,
+    subtopics_router,
+    case_studies_router,
+    sessions_router,
+    metrics_router,
+    usage_router,
+)
+from .routers.sessions import mark_interrupted_replies
 
 settings = get_settings()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Replies that were streaming when the last worker stopped will never finish
+    try:
+        async with AsyncSessionLocal() as db:
+            count = await mark_interrupted_replies(db)
+        if count:
+            print(f"Marked {count} interrupted replies as truncated")
+    except Exception as e:
+        print(f"Error marking interrupted replies: {str(e)}")
+    yield
+    await async_engine.dispose()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -25,6 +52,8 @@ app.include_router(fields_router, prefix=settings.API_V1_STR)
 app.include_router(subtopics_router, prefix=settings.API_V1_STR)
 app.include_router(case_studies_router, prefix=settings.API_V1_STR)
 app.include_router(sessions_router, prefix=settings.API_V1_STR)
+app.include_router(metrics_router, prefix=settings.API_V1_STR)
+app.include_router(usage_router, prefix=settings.API_V1_STR)
 
 @app.get("/")
 async def root():
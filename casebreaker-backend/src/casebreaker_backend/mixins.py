@@ -1,10 +1,23 @@
-import json
 from sqlalchemy import TypeDecorator, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
 class JSONEncodedDict(TypeDecorator):
-    """Represents an immutable structure as a json-encoded string."""
+    """
+    Represents an immutable structure as a json-encoded string.
+
+    Stored as JSONB on PostgreSQL, so the contents can be indexed and queried
+    with the JSONB operators, e.g. CaseStudy.checkpoints.contains([{"id": "1"}]).
+    Those operators are not available on SQLite.
+    """
 
     impl = JSON
+    cache_ok = True
+    comparator_factory = JSONB.Comparator
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(JSON())
 
     def process_bind_param(self, value, dialect):
         if value is not None:
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import DeclarativeBase, relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index, text
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import DeclarativeBase, column_property, relationship
 from .mixins import JSONEncodedDict
 
 
@@ -24,9 +25,12 @@ class Subtopic(Base):
     __tablename__ = "subtopics"
 
     id = Column(Integer, primary_key=True)
-    field_id = Column(Integer, ForeignKey("fields.id"), nullable=False)
+    field_id = Column(Integer, ForeignKey("fields.id"), nullable=False, index=True)
     name = Column(String, nullable=False)
     description = Column(String)
+    # Number of case studies, kept up to date as they are added and removed
+    # (see below); repair_case_counts.py recomputes it
+    case_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     field = relationship("Field", back_populates="subtopics")
     case_studies = relationship("CaseStudy", back_populates="subtopic")
@@ -36,7 +40,12 @@ class CaseStudy(Base):
     __tablename__ = "case_studies"
 
     id = Column(Integer, primary_key=True)
-    subtopic_id = Column(Integer, ForeignKey("subtopics.id"), nullable=False)
+    # active_history loads the old value on change, even once it has been
+    # expired by a commit, so a move can be taken off the old subtopic's count
+    subtopic_id = column_property(
+        Column(Integer, ForeignKey("subtopics.id"), nullable=False, index=True),
+        active_history=True,
+    )
     title = Column(String, nullable=False)
     description = Column(String)
     difficulty = Column(Integer)  # 1-5
@@ -55,20 +64,50 @@ class CaseStudy(Base):
     subtopic = relationship("Subtopic", back_populates="case_studies")
     sessions = relationship("Session", back_populates="case_study")
 
+    __table_args__ = (
+        # JSONB containment (@>) lookups, e.g. case studies with a checkpoint id
+        # or card; SQLite has no equivalent index
+        Index(
+            "ix_case_studies_checkpoints",
+            "checkpoints",
+            postgresql_using="gin",
+            postgresql_ops={"checkpoints": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_case_studies_context_materials",
+            "context_materials",
+            postgresql_using="gin",
+            postgresql_ops={"context_materials": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Session(Base):
     __tablename__ = "sessions"
 
     id = Column(Integer, primary_key=True)
-    case_study_id = Column(Integer, ForeignKey("case_studies.id"), nullable=False)
+    case_study_id = Column(
+        Integer, ForeignKey("case_studies.id"), nullable=False, index=True
+    )
     start_time = Column(DateTime, default=datetime.utcnow)
     completed_checkpoints = Column(JSONEncodedDict)
     status = Column(String)
-    device_id = Column(String, nullable=False)
+    device_id = Column(String, nullable=False, index=True)
+    summary = Column(Text)  # Rolling summary of turns older than the window
+    summary_through_id = Column(Integer)  # Last ChatMessage.id folded into summary
 
     case_study = relationship("CaseStudy", back_populates="sessions")
     chat_messages = relationship("ChatMessage", back_populates="session")
 
+    __table_args__ = (
+        Index(
+            "ix_sessions_completed_checkpoints",
+            "completed_checkpoints",
+            postgresql_using="gin",
+            postgresql_ops={"completed_checkpoints": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -77,7 +116,91 @@ class ChatMessage(Base):
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     checkpoint_id = Column(String)
+    status = Column(String, default="complete")  # 'streaming', 'complete' or 'truncated'
+    idempotency_key = Column(String)  # Client retry key for user messages
+    # Usage ledger, on assistant messages
+    model = Column(String)
+    route = Column(String)  # Name of the routing rule that picked the model
+    input_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    cache_creation_input_tokens = Column(Integer)
+    cache_read_input_tokens = Column(Integer)
+    ttft_ms = Column(Integer)  # Time to first token, after admission
+    duration_ms = Column(Integer)
 
     session = relationship("Session", back_populates="chat_messages")
+
+    __table_args__ = (
+        # A session's messages in order: history windows, replies after a
+        # given message and the conversation list
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+        # Replies left streaming by a stopped worker, found at startup
+        Index(
+            "ix_chat_messages_streaming",
+            "status",
+            sqlite_where=text("status = 'streaming'"),
+            postgresql_where=text("status = 'streaming'"),
+        ),
+        Index(
+            "ix_chat_messages_session_id_idempotency_key",
+            "session_id",
+            "idempotency_key",
+            unique=True,
+        ),
+    )
+
+
+class OpeningMessage(Base):
+    """Pre-generated first assistant message for a case study checkpoint."""
+
+    __tablename__ = "opening_messages"
+
+    id = Column(Integer, primary_key=True)
+    case_study_id = Column(Integer, ForeignKey("case_studies.id"), nullable=False)
+    checkpoint_id = Column(String, nullable=False)  # "" when no checkpoints remain
+    content = Column(Text, nullable=False)
+    case_study_updated = Column(DateTime)  # CaseStudy.last_updated it was made from
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index(
+            "ix_opening_messages_case_study_id_checkpoint_id",
+            "case_study_id",
+            "checkpoint_id",
+            unique=True,
+        ),
+    )
+
+
+def _change_case_count(connection, subtopic_id: int | None, delta: int):
+    if subtopic_id is None:
+        return
+    connection.execute(
+        update(Subtopic.__table__)
+        .where(Subtopic.__table__.c.id == subtopic_id)
+        .values(case_count=Subtopic.__table__.c.case_count + delta)
+    )
+
+
+# The counter is updated in the same transaction as the case study, so
+# listing subtopics never has to count case_studies. Bulk inserts and raw SQL
+# bypass these events.
+@event.listens_for(CaseStudy, "after_insert")
+def _count_added_case_study(mapper, connection, case_study):
+    _change_case_count(connection, case_study.subtopic_id, 1)
+
+
+@event.listens_for(CaseStudy, "after_delete")
+def _count_removed_case_study(mapper, connection, case_study):
+    _change_case_count(connection, case_study.subtopic_id, -1)
+
+
+@event.listens_for(CaseStudy, "after_update")
+def _count_moved_case_study(mapper, connection, case_study):
+    history = inspect(case_study).attrs.subtopic_id.history
+    if history.has_changes():
+        for old_subtopic_id in history.deleted:
+            _change_case_count(connection, old_subtopic_id, -1)
+        _change_case_count(connection, case_study.subtopic_id, 1)
@@ -2,3 +2,5 @@ from .fields import router as fields_router
 from .subtopics import router as subtopics_router
 from .case_studies import router as case_studies_router
 from .sessions import router as sessions_router
+from .metrics import router as metrics_router
+from .usage import router as usage_router
@@ -1,54 +1,59 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 import uuid
 from datetime import datetime
 
-from ..database import get_db
+from ..config import get_settings
+from ..database import get_db, AsyncSessionLocal
 from ..models import CaseStudy as CaseStudyModel, Subtopic as SubtopicModel
 from ..schemas import CaseStudy, CaseStudyCreate
+from ..services.admission import AdmissionRejected
+from ..services.openings import prewarm_openings
 
 router = APIRouter(prefix="/case-studies", tags=["case_studies"])
 
+# Relationships the CaseStudy response model reads, loaded up front since
+# async sessions cannot lazy load
+CASE_STUDY_LOADERS = [
+    selectinload(CaseStudyModel.subtopic).selectinload(SubtopicModel.field)
+]
+
 
 def generate_share_slug() -> str:
     """Generate a unique 8-character slug for sharing."""
     return str(uuid.uuid4())[:8]
 
 
-def get_case_count(db: Session, subtopic_id: int) -> int:
-    """Get the number of case studies for a given subtopic."""
-    return (
-        db.query(func.count(CaseStudyModel.id))
-        .filter(CaseStudyModel.subtopic_id == subtopic_id)
-        .scalar()
-    )
-
-
-def get_case_study_by_id_or_404(db: Session, case_study_id: int) -> CaseStudyModel:
+async def get_case_study_by_id_or_404(
+    db: AsyncSession, case_study_id: int
+) -> CaseStudyModel:
     """Get a case study by ID or raise 404 if not found."""
-    case_study = (
-        db.query(CaseStudyModel).filter(CaseStudyModel.id == case_study_id).first()
-    )
+    case_study = await db.get(CaseStudyModel, case_study_id, options=CASE_STUDY_LOADERS)
     if case_study is None:
         raise HTTPException(status_code=404, detail="Case study not found")
     return case_study
 
 
-def get_subtopic_by_id_or_404(db: Session, subtopic_id: int) -> SubtopicModel:
+async def get_subtopic_by_id_or_404(
+    db: AsyncSession, subtopic_id: int
+) -> SubtopicModel:
     """Get a subtopic by ID or raise 404 if not found."""
-    subtopic = db.query(SubtopicModel).filter(SubtopicModel.id == subtopic_id).first()
+    subtopic = await db.get(SubtopicModel, subtopic_id)
     if not subtopic:
         raise HTTPException(status_code=404, detail="Subtopic not found")
     return subtopic
 
 
 @router.post("/", response_model=CaseStudy)
-def create_case_study(case_study: CaseStudyCreate, db: Session = Depends(get_db)):
+async def create_case_study(
+    case_study: CaseStudyCreate, db: AsyncSession = Depends(get_db)
+):
     """Create a new case study."""
     # Verify subtopic exists
-    subtopic = get_subtopic_by_id_or_404(db, case_study.subtopic_id)
+    await get_subtopic_by_id_or_404(db, case_study.subtopic_id)
 
     # Create the case study
     db_case_study = CaseStudyModel(
@@ -58,11 +63,8 @@ def create_case_study(case_study: CaseStudyCreate, db: Session = Depends(get_db)
         created_at=datetime.utcnow()
     )
     db.add(db_case_study)
-    db.commit()
-    db.refresh(db_case_study)
-
-    # Set the case count
-    db_case_study.subtopic.case_count = get_case_count(db, case_study.subtopic_id)
+    await db.commit()
+    await db.refresh(db_case_study)
 
     return {
         "id": db_case_study.id,
@@ -84,56 +86,93 @@ def create_case_study(case_study: CaseStudyCreate, db: Session = Depends(get_db)
 
 
 @router.get("/", response_model=List[CaseStudy])
-def list_case_studies(subtopic_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def list_case_studies(
+    subtopic_id: Optional[int] = None, db: AsyncSession = Depends(get_db)
+):
     """List all case studies, optionally filtered by subtopic_id."""
     # Build the query
-    query = db.query(CaseStudyModel)
+    query = select(CaseStudyModel).options(*CASE_STUDY_LOADERS)
     if subtopic_id:
-        query = query.filter(CaseStudyModel.subtopic_id == subtopic_id)
-
-    # Get all case studies
-    case_studies = query.all()
-
-    # Get unique subtopic IDs from the results
-    subtopic_ids = {case.subtopic_id for case in case_studies}
-
-    # Get case counts for each subtopic
-    subtopic_counts = {}
-    for subtopic_id in subtopic_ids:
-        subtopic_counts[subtopic_id] = get_case_count(db, subtopic_id)
-
-    # Update each case study's subtopic with its count
-    for case in case_studies:
-        case.subtopic.case_count = subtopic_counts[case.subtopic_id]
-
-    return case_studies
+        query = query.where(CaseStudyModel.subtopic_id == subtopic_id)
+
+    # Get all case studies; subtopics carry their stored case count
+    return (await db.scalars(query)).all()
+
+
+_prewarming = False
+
+
+async def prewarm_in_background(case_study_ids: List[int]):
+    """Generate the openings of case_study_ids after the response was sent."""
+    global _prewarming
+    try:
+        async with AsyncSessionLocal() as db:
+            case_studies = (
+                await db.scalars(
+                    select(CaseStudyModel).where(CaseStudyModel.id.in_(case_study_ids))
+                )
+            ).all()
+            generated = await prewarm_openings(db, case_studies)
+        print(f"Prewarmed {generated} opening messages")
+    except AdmissionRejected as e:
+        print(f"Opening prewarm stopped: {str(e)}")
+    except Exception as e:
+        print(f"Error prewarming opening messages: {str(e)}")
+    finally:
+        _prewarming = False
+
+
+@router.post("/openings/prewarm", status_code=202)
+async def prewarm_opening_messages(
+    background_tasks: BackgroundTasks,
+    case_study_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Start generating missing or stale opening messages, for one or all case
+    studies. Generation runs after the response, one opening at a time.
+    """
+    global _prewarming
+    if not get_settings().OPENING_PREWARM:
+        raise HTTPException(status_code=403, detail="Opening prewarm is disabled")
+    if _prewarming:
+        raise HTTPException(status_code=409, detail="Opening prewarm already running")
+
+    if case_study_id is not None:
+        case_study_ids = [(await get_case_study_by_id_or_404(db, case_study_id)).id]
+    else:
+        case_study_ids = (await db.scalars(select(CaseStudyModel.id))).all()
+    _prewarming = True
+    background_tasks.add_task(prewarm_in_background, case_study_ids)
+    return {
+        "message": "Opening message prewarm started",
+        "case_studies": len(case_study_ids),
+    }
 
 
 @router.get("/{case_study_id}", response_model=CaseStudy)
-def get_case_study(case_study_id: int, db: Session = Depends(get_db)):
+async def get_case_study(case_study_id: int, db: AsyncSession = Depends(get_db)):
     """Get a case study by its ID."""
-    db_case_study = get_case_study_by_id_or_404(db, case_study_id)
-    db_case_study.subtopic.case_count = get_case_count(db, db_case_study.subtopic_id)
-    return db_case_study
+    return await get_case_study_by_id_or_404(db, case_study_id)
 
 
 @router.get("/by-slug/{share_slug}", response_model=CaseStudy)
-def get_case_study_by_slug(share_slug: str, db: Session = Depends(get_db)):
+async def get_case_study_by_slug(share_slug: str, db: AsyncSession = Depends(get_db)):
     """Get a case study by its share slug."""
-    db_case_study = (
-        db.query(CaseStudyModel).filter(CaseStudyModel.share_slug == share_slug).first()
+    db_case_study = await db.scalar(
+        select(CaseStudyModel)
+        .options(*CASE_STUDY_LOADERS)
+        .where(CaseStudyModel.share_slug == share_slug)
     )
     if db_case_study is None:
         raise HTTPException(status_code=404, detail="Case study not found")
-
-    db_case_study.subtopic.case_count = get_case_count(db, db_case_study.subtopic_id)
     return db_case_study
 
 
 @router.delete("/{case_study_id}")
-def delete_case_study(case_study_id: int, db: Session = Depends(get_db)):
+async def delete_case_study(case_study_id: int, db: AsyncSession = Depends(get_db)):
     """Delete a case study by its ID."""
-    db_case_study = get_case_study_by_id_or_404(db, case_study_id)
-    db.delete(db_case_study)
-    db.commit()
+    db_case_study = await get_case_study_by_id_or_404(db, case_study_id)
+    await db.delete(db_case_study)
+    await db.commit()
     return {"message": "Case study deleted"}
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from ..database import get_db
@@ -12,29 +13,29 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=Field)
-def create_field(field: FieldCreate, db: Session = Depends(get_db)):
+async def create_field(field: FieldCreate, db: AsyncSession = Depends(get_db)):
     db_field = FieldModel(**field.model_dump())
     db.add(db_field)
-    db.commit()
-    db.refresh(db_field)
+    await db.commit()
+    await db.refresh(db_field)
     return db_field
 
 @router.get("/", response_model=List[Field])
-def list_fields(db: Session = Depends(get_db)):
-    return db.query(FieldModel).all()
+async def list_fields(db: AsyncSession = Depends(get_db)):
+    return (await db.scalars(select(FieldModel))).all()
 
 @router.get("/{field_id}", response_model=Field)
-def get_field(field_id: int, db: Session = Depends(get_db)):
-    db_field = db.query(FieldModel).filter(FieldModel.id == field_id).first()
+async def get_field(field_id: int, db: AsyncSession = Depends(get_db)):
+    db_field = await db.get(FieldModel, field_id)
     if db_field is None:
         raise HTTPException(status_code=404, detail="Field not found")
     return db_field
 
 @router.delete("/{field_id}")
-def delete_field(field_id: int, db: Session = Depends(get_db)):
-    db_field = db.query(FieldModel).filter(FieldModel.id == field_id).first()
+async def delete_field(field_id: int, db: AsyncSession = Depends(get_db)):
+    db_field = await db.get(FieldModel, field_id)
     if db_field is None:
         raise HTTPException(status_code=404, detail="Field not found")
-    db.delete(db_field)
-    db.commit()
+    await db.delete(db_field)
+    await db.commit()
     return {"message": "Field deleted"}
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from ..services.metrics import metrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/")
+async def get_metrics():
+    """In-process counters and timing percentiles for this worker."""
+    return metrics.snapshot()
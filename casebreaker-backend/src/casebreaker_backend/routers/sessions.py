@@ -1,31 +1,359 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from typing import List, AsyncGenerator
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.background import BackgroundTask
+from typing import List, Dict, Any, AsyncGenerator, Awaitable, Callable
+from contextlib import aclosing
 from datetime import datetime
-import json
-from ..services.claude import claude_service, format_sse
+import asyncio
+import hashlib
 
-from ..database import get_db, SessionLocal
+import anyio
+
+from ..config import get_settings
+from ..database import get_db, AsyncSessionLocal
 from ..models import (
     Session as SessionModel,
     CaseStudy as CaseStudyModel,
     ChatMessage as ChatMessageModel,
+    Subtopic as SubtopicModel,
 )
 from ..schemas import Session, SessionCreate, ChatMessage, ChatMessageCreate
+from ..services.admission import admission_controller, AdmissionRejected
+from ..services.checkpoints import CheckpointMarkerParser, parse_admin_command
 from ..services.claude import claude_service
+from ..services.coalesce import coalesce_deltas
+from ..services.context import (
+    build_context,
+    estimate_tokens,
+    messages_to_fold,
+    summarize_messages,
+)
+from ..services.events import (
+    StreamEvent,
+    TextDelta,
+    UsageEvent,
+    StatusEvent,
+    ErrorEvent,
+    StartEvent,
+    EndEvent,
+    CheckpointEvent,
+    ProgressEvent,
+)
+from ..services.metrics import metrics
+from ..services.openings import (
+    case_study_context,
+    get_cached_opening,
+    opening_checkpoint,
+    store_opening,
+    stream_opening,
+)
+from ..services.progress import progress_hub, session_topic, device_topic
+from ..services.retrieval import select_context
+from ..services.routing import model_router, TurnFeatures
+from ..services.usage import UsageTotals, record_usage, usage_ledger
+from ..services.streams import stream_registry, StreamNotFound
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Type": "text/event-stream",
+}
+
+# Relationships the Session response model reads, loaded up front since
+# async sessions cannot lazy load
+SESSION_LOADERS = [
+    selectinload(SessionModel.case_study)
+    .selectinload(CaseStudyModel.subtopic)
+    .selectinload(SubtopicModel.field),
+    selectinload(SessionModel.chat_messages),
+]
+
+
+async def get_session_with_case_study(
+    db: AsyncSession, session_id: int
+) -> SessionModel | None:
+    return await db.get(
+        SessionModel, session_id, options=[selectinload(SessionModel.case_study)]
+    )
+
+
+async def record_completed_checkpoints(
+    db: AsyncSession, session_id: int, checkpoint_ids: List[str]
+) -> List[str]:
+    """Add checkpoint ids to a session's completed checkpoints."""
+    db_session = await get_session_with_case_study(db, session_id)
+    if db_session is None:
+        return []
+
+    completed = list(db_session.completed_checkpoints or [])
+    for checkpoint_id in checkpoint_ids:
+        if checkpoint_id not in completed:
+            completed.append(checkpoint_id)
+    db_session.completed_checkpoints = completed
+    with metrics.timer("db_write"):
+        await db.commit()
+    print(f"Checkpoints {checkpoint_ids} marked as completed")
+
+    progress_hub.publish(
+        [session_topic(session_id), device_topic(db_session.device_id)],
+        session_progress(db_session, checkpoint_ids),
+    )
+    return completed
+
+
+def session_progress(
+    db_session: SessionModel, completed_ids: List[str] | None = None
+) -> ProgressEvent:
+    return ProgressEvent(
+        session_id=db_session.id,
+        completed_checkpoints=list(db_session.completed_checkpoints or []),
+        total=len(db_session.case_study.checkpoints or []),
+        completed=completed_ids or [],
+    )
+
+
+async def get_unsummarized_history(
+    db: AsyncSession, session: SessionModel
+) -> List[Dict[str, Any]]:
+    """Load the messages newer than the session's rolling summary, oldest first."""
+    settings = get_settings()
+    # Folding keeps this bounded; the limit only guards against a stalled summary
+    limit = 4 * (settings.CONTEXT_RECENT_TURNS + settings.CONTEXT_SUMMARY_EVERY_TURNS)
+    rows = (
+        await db.scalars(
+            select(ChatMessageModel)
+            .where(
+                ChatMessageModel.session_id == session.id,
+                ChatMessageModel.id > (session.summary_through_id or 0),
+            )
+            .order_by(ChatMessageModel.id.desc())
+            .limit(limit)
+        )
+    ).all()
+    return [
+        {"id": msg.id, "role": msg.role, "content": msg.content}
+        for msg in reversed(rows)
+    ]
+
+
+async def save_assistant_message(
+    db: AsyncSession,
+    session_id: int,
+    content: str,
+    status: str = "complete",
+    ledger: Dict[str, Any] | None = None,
+) -> ChatMessageModel:
+    """Persist an assistant reply, with its usage ledger if it was generated."""
+    ai_message = ChatMessageModel(
+        role="assistant",
+        content=content,
+        session_id=session_id,
+        timestamp=datetime.utcnow(),
+        status=status,
+        **(ledger or {}),
+    )
+    db.add(ai_message)
+    with metrics.timer("db_write"):
+        await db.commit()
+    return ai_message
+
+
+class AssistantMessageWriter:
+    """
+    Persists an assistant reply while it streams.
+
+    The row is created with status "streaming" when the first text arrives
+    and its content is rewritten at most once per interval_seconds, so a
+    crash loses at most that much text and a reload shows the answer so far.
+    """
+
+    def __init__(self, db: AsyncSession, session_id: int, interval_seconds: float):
+        self.db = db
+        self.session_id = session_id
+        self.interval_seconds = interval_seconds
+        self.parts: List[str] = []
+        self.message: ChatMessageModel | None = None
+        self._saved_at = 0.0
+
+    @property
+    def content(self) -> str:
+        return "".join(self.parts).strip()
+
+    async def append(self, text: str):
+        self.parts.append(text)
+        now = asyncio.get_running_loop().time()
+        if self.message is None or now - self._saved_at >= self.interval_seconds:
+            await self._save("streaming")
+            self._saved_at = now
+
+    async def finish(self, status: str, ledger: Dict[str, Any] | None = None):
+        """
+        Write the final content and usage ledger, dropping the row if nothing
+        was generated.
+        """
+        if self.content:
+            await self._save(status, ledger)
+        elif self.message is not None:
+            await self.db.delete(self.message)
+            await self.db.commit()
+
+    async def _save(self, status: str, ledger: Dict[str, Any] | None = None):
+        if self.message is None:
+            self.message = ChatMessageModel(
+                role="assistant",
+                session_id=self.session_id,
+                timestamp=datetime.utcnow(),
+            )
+            self.db.add(self.message)
+        self.message.content = self.content
+        self.message.status = status
+        for key, value in (ledger or {}).items():
+            setattr(self.message, key, value)
+        with metrics.timer("db_write"):
+            await self.db.commit()
+
+
+class AdmittedGeneration:
+    """
+    One model stream sent to a client.
+
+    admit() waits for an LLM slot, yielding "queued" status events for the
+    client, and events() coalesces the stream's text deltas while timing the
+    first token for the usage ledger. release() must be called when done.
+    """
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.ticket = None
+        self.started_at: float | None = None
+        self.first_token_at: float | None = None
+        self._loop = asyncio.get_running_loop()
+
+    async def admit(self) -> AsyncGenerator[str, None]:
+        self.ticket = admission_controller.enqueue(self.device_id)
+        async for position in admission_controller.wait(self.ticket):
+            yield StatusEvent(
+                "queued", f"Waiting for a free tutor, position {position} in queue"
+            ).to_sse()
+
+    async def events(
+        self, stream: AsyncGenerator[StreamEvent, None]
+    ) -> AsyncGenerator[StreamEvent, None]:
+        settings = get_settings()
+        self.started_at = self._loop.time()
+        async with aclosing(
+            coalesce_deltas(
+                stream, settings.SSE_COALESCE_MS, settings.SSE_COALESCE_BYTES
+            )
+        ) as events:
+            async for event in events:
+                if isinstance(event, TextDelta) and self.first_token_at is None:
+                    self.first_token_at = self._loop.time()
+                yield event
+
+    def ledger(self, model: str, route: str, usage: UsageTotals) -> Dict[str, Any]:
+        return usage_ledger(
+            model, route, usage, self.started_at, self.first_token_at, self._loop.time()
+        )
+
+    def release(self):
+        if self.ticket is not None:
+            admission_controller.release(self.ticket)
+            self.ticket = None
+
+
+async def mark_interrupted_replies(db: AsyncSession) -> int:
+    """Mark replies left "streaming" by a worker that stopped as truncated."""
+    result = await db.execute(
+        update(ChatMessageModel)
+        .where(ChatMessageModel.status == "streaming")
+        .values(status="truncated")
+    )
+    await db.commit()
+    return result.rowcount
+
+
+def record_cancelled_stream(partial_content: str):
+    """
+    Count a stream cancelled by a client disconnect.
+
+    The tokens saved are estimated as the average length of a completed reply
+    minus what was generated before the disconnect.
+    """
+    metrics.incr("chat_streams_cancelled")
+    completed = metrics.counter("chat_streams_completed")
+    if not completed:
+        return
+    expected = metrics.counter("llm_output_tokens") / completed
+    saved = max(0, round(expected - estimate_tokens(partial_content)))
+    metrics.incr("cancelled_stream_tokens_saved", saved)
+
+
+_summarizing = set()
+
+# Admission control key for summary calls, so they never take more than
+# LLM_MAX_PER_DEVICE slots from students
+SUMMARY_DEVICE_ID = "summaries"
+
+
+async def update_session_summary(session_id: int):
+    """Fold a session's older turns into its rolling summary."""
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    settings = get_settings()
+    db = AsyncSessionLocal()
+    try:
+        db_session = await db.get(SessionModel, session_id)
+        if db_session is None:
+            return
+        fold = messages_to_fold(
+            await get_unsummarized_history(db, db_session),
+            settings.CONTEXT_RECENT_TURNS,
+            settings.CONTEXT_SUMMARY_EVERY_TURNS,
+        )
+        if not fold:
+            return
+        previous_summary = db_session.summary
+        # Don't hold a pooled connection while queued for an LLM slot
+        await db.rollback()
+
+        usage = UsageTotals()
+        async with admission_controller.slot(SUMMARY_DEVICE_ID):
+            summary = await summarize_messages(
+                claude_service.provider,
+                previous_summary,
+                fold,
+                model=settings.SUMMARY_MODEL,
+                max_tokens=settings.SUMMARY_MAX_TOKENS,
+                usage=usage,
+            )
+        record_usage("summary", settings.SUMMARY_MODEL, usage)
+        db_session = await db.get(SessionModel, session_id)
+        if db_session is None:
+            return
+        db_session.summary = summary
+        db_session.summary_through_id = fold[-1]["id"]
+        with metrics.timer("db_write"):
+            await db.commit()
+        print(f"Session {session_id} summary updated through message {fold[-1]['id']}")
+    except Exception as e:
+        print(f"Error updating session summary: {str(e)}")
+    finally:
+        await db.close()
+        _summarizing.discard(session_id)
+
 
 @router.post("/", response_model=Session)
-def create_session(session: SessionCreate, db: Session = Depends(get_db)):
+async def create_session(session: SessionCreate, db: AsyncSession = Depends(get_db)):
     # Verify case study exists
-    case_study = (
-        db.query(CaseStudyModel)
-        .filter(CaseStudyModel.id == session.case_study_id)
-        .first()
-    )
+    case_study = await db.get(CaseStudyModel, session.case_study_id)
     if not case_study:
         raise HTTPException(status_code=404, detail="Case study not found")
 
@@ -34,189 +362,528 @@ def create_session(session: SessionCreate, db: Session = Depends(get_db)):
     session_data["completed_checkpoints"] = []
     db_session = SessionModel(**session_data)
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    await db.commit()
+    return await db.get(
+        SessionModel, db_session.id, options=SESSION_LOADERS, populate_existing=True
+    )
 
 
 @router.get("/", response_model=List[Session])
-def list_sessions(device_id: str | None = None, db: Session = Depends(get_db)):
-    query = db.query(SessionModel)
+async def list_sessions(
+    device_id: str | None = None, db: AsyncSession = Depends(get_db)
+):
+    query = select(SessionModel).options(*SESSION_LOADERS)
     if device_id:
-        query = query.filter(SessionModel.device_id == device_id)
-    return query.all()
+        query = query.where(SessionModel.device_id == device_id)
+    return (await db.scalars(query)).all()
+
+
+async def progress_stream(
+    topic: str, load_snapshot: Callable[[AsyncSession], Awaitable[List[ProgressEvent]]]
+) -> AsyncGenerator[str, None]:
+    """Current progress first, then each change, with keep-alive comments."""
+    # Subscribe before reading the snapshot so no change falls in between
+    subscription = progress_hub.subscribe(topic)
+    try:
+        async with AsyncSessionLocal() as db:
+            snapshot = await load_snapshot(db)
+        for event in snapshot:
+            yield event.to_sse()
+
+        heartbeat_seconds = get_settings().PROGRESS_HEARTBEAT_SECONDS
+        while True:
+            event = await subscription.get(heartbeat_seconds)
+            yield ": keep-alive\n\n" if event is None else event.to_sse()
+    finally:
+        subscription.close()
+
+
+@router.get("/progress")
+async def subscribe_device_progress(device_id: str):
+    """Stream checkpoint progress for every session of a device."""
+
+    async def load_snapshot(db: AsyncSession) -> List[ProgressEvent]:
+        sessions = await db.scalars(
+            select(SessionModel)
+            .options(selectinload(SessionModel.case_study))
+            .where(SessionModel.device_id == device_id)
+        )
+        return [session_progress(db_session) for db_session in sessions]
+
+    return StreamingResponse(
+        progress_stream(device_topic(device_id), load_snapshot),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.get("/{session_id}/progress")
+async def subscribe_session_progress(
+    session_id: int, db: AsyncSession = Depends(get_db)
+):
+    """Stream a session's checkpoint progress instead of polling the session."""
+    db_session = await db.get(SessionModel, session_id)
+    if db_session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    async def load_snapshot(db: AsyncSession) -> List[ProgressEvent]:
+        db_session = await get_session_with_case_study(db, session_id)
+        return [session_progress(db_session)] if db_session else []
+
+    return StreamingResponse(
+        progress_stream(session_topic(session_id), load_snapshot),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
 
 
 @router.get("/{session_id}", response_model=Session)
-def get_session(session_id: int, db: Session = Depends(get_db)):
-    db_session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+async def get_session(session_id: int, db: AsyncSession = Depends(get_db)):
+    db_session = await db.get(SessionModel, session_id, options=SESSION_LOADERS)
     if db_session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     return db_session
 
 
+def post_fingerprint(content: str) -> str:
+    """Request key for posts without an Idempotency-Key."""
+    return "content:" + hashlib.sha256(content.encode()).hexdigest()
+
+
+async def replay_stored_response(content: str) -> AsyncGenerator[str, None]:
+    """Send a response that was already saved as a single-chunk stream."""
+    yield StartEvent().to_sse()
+    yield TextDelta(content).to_sse()
+    yield EndEvent().to_sse()
+
+
+async def admin_command_response(
+    checkpoint_id: str, progress: CheckpointEvent
+) -> AsyncGenerator[str, None]:
+    """The stream sent for a DEUS admin command; nothing is generated."""
+    yield StartEvent().to_sse()
+    yield progress.to_sse()
+    yield StatusEvent(
+        "complete", f"Checkpoint {checkpoint_id} marked as completed"
+    ).to_sse()
+    yield EndEvent().to_sse()
+
+
+def stored_response(reply: ChatMessageModel) -> StreamingResponse:
+    """Replay a saved reply to a retried post."""
+    metrics.incr("chat_requests_deduplicated")
+    return StreamingResponse(
+        replay_stored_response(reply.content),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+async def find_stored_response(
+    db: AsyncSession, session_id: int, idempotency_key: str
+) -> ChatMessageModel | None:
+    """
+    The assistant reply to the user message posted with idempotency_key.
+
+    Raises 409 if the key was used but no reply was saved, e.g. because the
+    generation failed; the client should reload the conversation.
+    """
+    user_message = await db.scalar(
+        select(ChatMessageModel).where(
+            ChatMessageModel.session_id == session_id,
+            ChatMessageModel.idempotency_key == idempotency_key,
+        )
+    )
+    if user_message is None:
+        return None
+    reply = await db.scalar(
+        select(ChatMessageModel)
+        .where(
+            ChatMessageModel.session_id == session_id,
+            ChatMessageModel.role == "assistant",
+            ChatMessageModel.id > user_message.id,
+        )
+        .order_by(ChatMessageModel.id)
+        .limit(1)
+    )
+    if reply is None:
+        raise HTTPException(
+            status_code=409,
+            detail="This message has no saved reply, reload the conversation",
+        )
+    return reply
+
+
 @router.post("/{session_id}/messages")
 async def create_chat_message(
-    session_id: int, message: ChatMessageCreate, db: Session = Depends(get_db)
+    session_id: int,
+    message: ChatMessageCreate,
+    db: AsyncSession = Depends(get_db),
+    last_event_id: str | None = Header(None),
+    idempotency_key: str | None = Header(None),
 ):
     # Verify session exists
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    session = await get_session_with_case_study(db, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    # A reconnecting client resumes the in-flight response instead of
+    # starting a new one
+    if last_event_id:
+        try:
+            stream, after_seq = stream_registry.resume(session_id, last_event_id)
+        except StreamNotFound as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return StreamingResponse(
+            stream.subscribe(after_seq),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    # Admin commands complete a checkpoint directly instead of asking the
+    # model to echo a marker back
+    admin_checkpoint_id = parse_admin_command(message.content)
+    if admin_checkpoint_id is not None and get_settings().ADMIN_COMMANDS:
+        checkpoints = session.case_study.checkpoints or []
+        if not any(cp["id"] == admin_checkpoint_id for cp in checkpoints):
+            raise HTTPException(
+                status_code=404, detail="Checkpoint not found in case study"
+            )
+        db.add(
+            ChatMessageModel(
+                **message.model_dump(),
+                session_id=session_id,
+                timestamp=datetime.utcnow(),
+            )
+        )
+        await db.commit()
+        completed = await record_completed_checkpoints(
+            db, session_id, [admin_checkpoint_id]
+        )
+        progress = CheckpointEvent([admin_checkpoint_id], completed, len(checkpoints))
+        metrics.incr("admin_commands")
+        return StreamingResponse(
+            admin_command_response(admin_checkpoint_id, progress),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    # Concurrent retries wait here until the first has registered its stream
+    request_key = idempotency_key or post_fingerprint(message.content)
+    async with stream_registry.claim(session_id, request_key):
+        return await start_chat_stream(
+            db, session, message, idempotency_key, request_key
+        )
+
+
+async def start_chat_stream(
+    db: AsyncSession,
+    session: SessionModel,
+    message: ChatMessageCreate,
+    idempotency_key: str | None,
+    request_key: str,
+) -> StreamingResponse:
+    """Attach to, replay or start generating the response to a chat post."""
+    session_id = session.id
+
+    # Retries attach to the response still being generated for the same
+    # request, as long as it can be replayed from the start. Once it is done
+    # the saved reply is replayed instead; without an Idempotency-Key a
+    # finished post is simply generated again.
+    stream = stream_registry.find(session_id, request_key)
+    if stream is not None and not stream.done:
+        if not stream.can_resume_from(0):
+            raise HTTPException(
+                status_code=409,
+                detail="This message is still being answered, reload the conversation",
+            )
+        metrics.incr("chat_requests_deduplicated")
+        return StreamingResponse(
+            stream.subscribe(), media_type="text/event-stream", headers=SSE_HEADERS
+        )
+    if idempotency_key:
+        reply = await find_stored_response(db, session_id, idempotency_key)
+        if reply is not None:
+            return stored_response(reply)
+
+    # Shed load before doing any work if the LLM wait queue is full
+    device_id = session.device_id
+    try:
+        admission_controller.check(device_id)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
     # Save user message
     db_message = ChatMessageModel(
-        **message.model_dump(), session_id=session_id, timestamp=datetime.utcnow()
+        **message.model_dump(),
+        session_id=session_id,
+        timestamp=datetime.utcnow(),
+        idempotency_key=idempotency_key,
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
-
-    # Get conversation history
-    messages = [
-        {"role": msg.role, "content": msg.content}
-        for msg in db.query(ChatMessageModel)
-        .filter(ChatMessageModel.session_id == session_id)
-        .order_by(ChatMessageModel.timestamp)
-        .all()
-    ]
+    try:
+        with metrics.timer("db_write"):
+            await db.commit()
+    except IntegrityError:
+        # The same Idempotency-Key was posted to another worker in between
+        await db.rollback()
+        reply = await find_stored_response(db, session_id, idempotency_key)
+        if reply is None:
+            raise
+        return stored_response(reply)
 
-    # Create a new database session for the async generator
-    async_db = SessionLocal()
+    # Get the conversation history not yet folded into the rolling summary
+    settings = get_settings()
+    history = await get_unsummarized_history(db, session)
+    messages = build_context(history, session.summary, settings.CONTEXT_TOKEN_BUDGET)
+
+    # Fold older turns into the summary once the response has been sent
+    background = None
+    if messages_to_fold(
+        history, settings.CONTEXT_RECENT_TURNS, settings.CONTEXT_SUMMARY_EVERY_TURNS
+    ):
+        background = BackgroundTask(update_session_summary, session_id)
+
+    # Only send the checkpoints still open and the context relevant to them
     case_study = session.case_study
+    prompt_case_study = select_context(
+        case_study_context(case_study),
+        session.completed_checkpoints,
+        message.content,
+        settings.CONTEXT_MAX_CARDS,
+    )
+
+    # Pick the model and output budget for this turn
+    route = model_router.route(
+        TurnFeatures(
+            message_chars=len(message.content),
+            difficulty=case_study.difficulty,
+            remaining_checkpoints=len(prompt_case_study["checkpoints"]),
+            queue_length=admission_controller.queue_length,
+        )
+    )
+
+    # The request's session is only closed once the response has been sent;
+    # hand its connection back to the pool now rather than holding it for
+    # the whole stream
+    await db.close()
+
+    # Create a new database session for the async generator
+    async_db = AsyncSessionLocal()
 
     # Stream the AI response
     async def generate_and_save_response():
-        response_content = ""
+        writer = AssistantMessageWriter(
+            async_db, session_id, settings.STREAM_SAVE_INTERVAL_SECONDS
+        )
+        marker_parser = CheckpointMarkerParser()
+        usage = UsageTotals()
+        stop_reason = None
+        generation = AdmittedGeneration(device_id)
+        metrics.incr("chat_streams")
+
+        def ledger() -> Dict[str, Any]:
+            if stop_reason is None:
+                # Cancelled or failed before the provider's final usage event;
+                # estimate the output from what was generated
+                usage.output_tokens = max(
+                    usage.output_tokens, estimate_tokens(writer.content)
+                )
+            return generation.ledger(route.model, route.name, usage)
+
         try:
+            # Wait for an LLM slot, telling the client where it is in the queue
+            async for queued in generation.admit():
+                yield queued
+
             print("Starting response generation...")
-            async for chunk in claude_service.generate_response(
-                messages=messages,
-                case_study={
-                    "title": case_study.title,
-                    "description": case_study.description,
-                    "learning_objectives": case_study.learning_objectives,
-                    "context_materials": case_study.context_materials,
-                    "checkpoints": case_study.checkpoints,
-                },
-            ):
-                yield chunk
-                # Extract content from chunk if it's a text chunk
-                try:
-                    # Extract the data line from the SSE chunk
-                    lines = chunk.strip().split("\n")
-                    data_line = next(
-                        (line for line in lines if line.startswith("data: ")), None
+            async with aclosing(
+                generation.events(
+                    claude_service.generate_response(
+                        messages=messages,
+                        case_study=prompt_case_study,
+                        model=route.model,
+                        max_tokens=route.max_tokens,
                     )
-                    if data_line:
-                        # Remove 'data: ' prefix
-                        data_str = data_line.replace("data: ", "", 1).strip()
-                        data = json.loads(data_str)
-                        if data["type"] == "chunk":
-                            chunk_content = data["data"]
-                            response_content += chunk_content
-                            print(
-                                f"Accumulated content length: {len(response_content)}"
+                )
+            ) as events:
+                async for event in events:
+                    if isinstance(event, TextDelta):
+                        visible, checkpoint_ids = marker_parser.feed(event.text)
+                        if visible:
+                            await writer.append(visible)
+                            yield TextDelta(visible).to_sse()
+                        if checkpoint_ids:
+                            completed = await record_completed_checkpoints(
+                                async_db, session_id, checkpoint_ids
                             )
+                            yield CheckpointEvent(
+                                checkpoint_ids,
+                                completed,
+                                len(case_study.checkpoints or []),
+                            ).to_sse()
+                        continue
 
-                            # Check for completed checkpoints marker
-                            if "[CHECKPOINTS_COMPLETED]" in response_content:
-                                import re
-
-                                # Extract checkpoint IDs from the marker
-                                match = re.search(
-                                    r"\[CHECKPOINTS_COMPLETED\]\[([^\]]+)\]",
-                                    response_content,
-                                )
-                                print(match)
-                                if match:
-                                    # Get the comma-separated checkpoint IDs
-                                    checkpoint_ids = [
-                                        id.strip() for id in match.group(1).split(",")
-                                    ]
-
-                                    # Remove the marker from response
-                                    response_content = re.sub(
-                                        r"\[CHECKPOINTS_COMPLETED\]\[[^\]]+\]",
-                                        "",
-                                        response_content,
-                                    ).strip()
-
-                                    # Update completed checkpoints in session
-                                    completed = session.completed_checkpoints or []
-                                    for checkpoint_id in checkpoint_ids:
-                                        if checkpoint_id not in completed:
-                                            completed.append(checkpoint_id)
-
-                                    # Update the session in async_db
-                                    async_session = async_db.query(SessionModel).filter(SessionModel.id == session_id).first()
-                                    if async_session:
-                                        async_session.completed_checkpoints = completed
-                                        async_db.commit()
-                                        print(f"Checkpoints {checkpoint_ids} marked as completed")
-                                        print(f"Updated checkpoints: {async_session.completed_checkpoints}")
-                except Exception as e:
-                    print(f"Error parsing chunk: {str(e)}")
-                    print(f"Raw chunk: {chunk}")
-                    pass
-
-            print(f"Final response content length: {len(response_content)}")
-            # Only save if we accumulated some content
-            if response_content:
-                print("Saving assistant message...")
-                ai_message = ChatMessageModel(
-                    role="assistant",
-                    content=response_content,
-                    session_id=session_id,
-                    timestamp=datetime.utcnow(),
-                )
-                async_db.add(ai_message)
-                async_db.commit()
-                print("Assistant message saved successfully")
+                    # Release text held back as a possible marker before
+                    # passing status/end events through
+                    held = marker_parser.flush()
+                    if held:
+                        await writer.append(held)
+                        yield TextDelta(held).to_sse()
+
+                    # Usage is accounted for server-side, not sent to the client
+                    if isinstance(event, UsageEvent):
+                        usage.add(event)
+                        stop_reason = event.stop_reason or stop_reason
+                    else:
+                        yield event.to_sse()
+
+            writer.parts.append(marker_parser.flush())
+            print(f"Final response content length: {len(writer.content)}")
+            metrics.incr("chat_streams_completed")
+            metrics.incr("llm_output_tokens", usage.output_tokens)
+            if stop_reason == "max_tokens":
+                # Cut off by the route's output budget, possibly before a
+                # checkpoint marker
+                metrics.incr("chat_replies_max_tokens")
+                print(f"Reply hit max_tokens {route.max_tokens} on {route.model}")
+                await writer.finish("truncated", ledger())
             else:
-                print("No content accumulated, skipping save")
+                await writer.finish("complete", ledger())
 
+        except (asyncio.CancelledError, GeneratorExit):
+            # Every client went away and none reconnected in time: the
+            # upstream stream has been closed, so keep what was generated so
+            # far and stop
+            writer.parts.append(marker_parser.flush())
+            record_cancelled_stream(writer.content)
+            await writer.finish("truncated", ledger())
+            print(f"Client disconnected, saved {len(writer.content)} characters")
+            raise
+        except AdmissionRejected as e:
+            yield ErrorEvent(str(e)).to_sse()
         except Exception as e:
+            metrics.incr("chat_stream_errors")
             print(f"Error generating response: {str(e)}")
-            error_msg = format_sse(
-                {"type": "error", "data": f"Error generating response: {str(e)}"},
-                "error",
-            )
-            yield error_msg
+            # Keep whatever was streamed before the failure
+            try:
+                await writer.finish("truncated", ledger())
+            except Exception:
+                await async_db.rollback()
+            yield ErrorEvent(f"Error generating response: {str(e)}").to_sse()
         finally:
-            async_db.close()
+            generation.release()
+            await async_db.close()
 
+    # Generate in the background so a dropped connection can resume
+    stream = stream_registry.create(
+        session_id, db_message.id, generate_and_save_response(), request_key
+    )
     return StreamingResponse(
-        generate_and_save_response(),
+        stream.subscribe(),
+        background=background,
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Content-Type": "text/event-stream",
-        },
+        headers=SSE_HEADERS,
+    )
+
+
+@router.post("/{session_id}/opening")
+async def create_opening_message(session_id: int, db: AsyncSession = Depends(get_db)):
+    """Start a conversation with the tutor's opening message."""
+    session = await get_session_with_case_study(db, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    started = await db.scalar(
+        select(ChatMessageModel.id)
+        .where(ChatMessageModel.session_id == session_id)
+        .limit(1)
+    )
+    if started:
+        raise HTTPException(status_code=409, detail="Conversation already started")
+
+    # Openings are shared by every session starting at the same checkpoint
+    case_study = session.case_study
+    checkpoint_id = opening_checkpoint(case_study, session.completed_checkpoints)
+    content = await get_cached_opening(db, case_study, checkpoint_id)
+    if content is not None:
+        await save_assistant_message(db, session_id, content)
+        return StreamingResponse(
+            replay_stored_response(content),
+            media_type="text/event-stream",
+            headers=SSE_HEADERS,
+        )
+
+    device_id = session.device_id
+    try:
+        admission_controller.check(device_id)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    await db.close()
+    async_db = AsyncSessionLocal()
+
+    async def generate_and_cache_opening():
+        parts = []
+        usage = UsageTotals()
+        generation = AdmittedGeneration(device_id)
+        try:
+            async for queued in generation.admit():
+                yield queued
+
+            async with aclosing(
+                generation.events(stream_opening(case_study, checkpoint_id, usage))
+            ) as events:
+                async for event in events:
+                    if isinstance(event, TextDelta):
+                        parts.append(event.text)
+                    yield event.to_sse()
+
+            content = "".join(parts).strip()
+            if content:
+                await store_opening(async_db, case_study, checkpoint_id, content)
+                ledger = generation.ledger(claude_service.model, "opening", usage)
+                await save_assistant_message(
+                    async_db, session_id, content, ledger=ledger
+                )
+        except AdmissionRejected as e:
+            yield ErrorEvent(str(e)).to_sse()
+        except Exception as e:
+            print(f"Error generating opening: {str(e)}")
+            yield ErrorEvent(f"Error generating response: {str(e)}").to_sse()
+        finally:
+            generation.release()
+            # A client disconnect cancels this generator; still hand the
+            # connection back to the pool
+            with anyio.CancelScope(shield=True):
+                await async_db.close()
+
+    return StreamingResponse(
+        generate_and_cache_opening(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
     )
 
 
 @router.get("/{session_id}/messages", response_model=List[ChatMessage])
-def list_chat_messages(session_id: int, db: Session = Depends(get_db)):
+async def list_chat_messages(session_id: int, db: AsyncSession = Depends(get_db)):
     # Verify session exists
-    session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    session = await db.get(SessionModel, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
     return (
-        db.query(ChatMessageModel)
-        .filter(ChatMessageModel.session_id == session_id)
-        .all()
-    )
+        await db.scalars(
+            select(ChatMessageModel).where(ChatMessageModel.session_id == session_id)
+        )
+    ).all()
 
 
 @router.post("/{session_id}/checkpoints/{checkpoint_id}")
-def complete_checkpoint(
-    session_id: int, checkpoint_id: str, db: Session = Depends(get_db)
+async def complete_checkpoint(
+    session_id: int, checkpoint_id: str, db: AsyncSession = Depends(get_db)
 ):
     # Get session and verify it exists
-    db_session = db.query(SessionModel).filter(SessionModel.id == session_id).first()
+    db_session = await get_session_with_case_study(db, session_id)
     if db_session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
@@ -231,8 +898,6 @@ def complete_checkpoint(
     # Update completed checkpoints
     completed = db_session.completed_checkpoints or []
     if checkpoint_id not in completed:
-        completed.append(checkpoint_id)
-        db_session.completed_checkpoints = completed
-        db.commit()
+        completed = await record_completed_checkpoints(db, session_id, [checkpoint_id])
 
     return {"message": "Checkpoint completed", "completed_checkpoints": completed}
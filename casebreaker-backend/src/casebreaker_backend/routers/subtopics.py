@@ -1,5 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 
 from ..database import get_db
@@ -10,34 +12,36 @@ router = APIRouter(prefix="/subtopics", tags=["subtopics"])
 
 
 @router.post("/", response_model=Subtopic)
-def create_subtopic(subtopic: SubtopicCreate, db: Session = Depends(get_db)):
+async def create_subtopic(subtopic: SubtopicCreate, db: AsyncSession = Depends(get_db)):
     # Verify field exists
-    field = db.query(FieldModel).filter(FieldModel.id == subtopic.field_id).first()
+    field = await db.get(FieldModel, subtopic.field_id)
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
 
     db_subtopic = SubtopicModel(**subtopic.model_dump())
     db.add(db_subtopic)
-    db.commit()
-    db.refresh(db_subtopic)
-    
+    await db.commit()
+    await db.refresh(db_subtopic)
+
     # Convert to response model with case count
     return {
         "id": db_subtopic.id,
         "name": db_subtopic.name,
         "description": db_subtopic.description,
         "field_id": db_subtopic.field_id,
-        "field": db_subtopic.field,
-        "case_count": 0  # New subtopic has no cases
+        "field": field,
+        "case_count": db_subtopic.case_count,
     }
 
 
 @router.get("/", response_model=List[Subtopic])
-def list_subtopics(field_id: int | None = None, db: Session = Depends(get_db)):
-    query = db.query(SubtopicModel).options(joinedload(SubtopicModel.case_studies))
+async def list_subtopics(
+    field_id: int | None = None, db: AsyncSession = Depends(get_db)
+):
+    query = select(SubtopicModel).options(selectinload(SubtopicModel.field))
     if field_id:
-        query = query.filter(SubtopicModel.field_id == field_id)
-    subtopics = query.all()
+        query = query.where(SubtopicModel.field_id == field_id)
+    subtopics = (await db.scalars(query)).all()
 
     # Convert to response model with case count
     response_subtopics = []
@@ -48,7 +52,7 @@ def list_subtopics(field_id: int | None = None, db: Session = Depends(get_db)):
             "description": subtopic.description,
             "field_id": subtopic.field_id,
             "field": subtopic.field,
-            "case_count": len(subtopic.case_studies),
+            "case_count": subtopic.case_count,
         }
         response_subtopics.append(subtopic_dict)
 
@@ -56,16 +60,13 @@ def list_subtopics(field_id: int | None = None, db: Session = Depends(get_db)):
 
 
 @router.get("/{subtopic_id}", response_model=Subtopic)
-def get_subtopic(subtopic_id: int, db: Session = Depends(get_db)):
-    db_subtopic = (
-        db.query(SubtopicModel)
-        .options(joinedload(SubtopicModel.case_studies))
-        .filter(SubtopicModel.id == subtopic_id)
-        .first()
+async def get_subtopic(subtopic_id: int, db: AsyncSession = Depends(get_db)):
+    db_subtopic = await db.get(
+        SubtopicModel, subtopic_id, options=[selectinload(SubtopicModel.field)]
     )
     if db_subtopic is None:
         raise HTTPException(status_code=404, detail="Subtopic not found")
-    
+
     # Convert to response model with case count
     return {
         "id": db_subtopic.id,
@@ -73,17 +74,15 @@ def get_subtopic(subtopic_id: int, db: Session = Depends(get_db)):
         "description": db_subtopic.description,
         "field_id": db_subtopic.field_id,
         "field": db_subtopic.field,
-        "case_count": len(db_subtopic.case_studies)
+        "case_count": db_subtopic.case_count
     }
 
 
 @router.delete("/{subtopic_id}")
-def delete_subtopic(subtopic_id: int, db: Session = Depends(get_db)):
-    db_subtopic = (
-        db.query(SubtopicModel).filter(SubtopicModel.id == subtopic_id).first()
-    )
+async def delete_subtopic(subtopic_id: int, db: AsyncSession = Depends(get_db)):
+    db_subtopic = await db.get(SubtopicModel, subtopic_id)
     if db_subtopic is None:
         raise HTTPException(status_code=404, detail="Subtopic not found")
-    db.delete(db_subtopic)
-    db.commit()
+    await db.delete(db_subtopic)
+    await db.commit()
     return {"message": "Subtopic deleted"}
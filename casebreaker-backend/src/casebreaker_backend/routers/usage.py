@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Dict, List, Literal
+
+from fastapi import APIRouter, Depends
+from sqlalchemy import String, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..models import ChatMessage as ChatMessageModel, Session as SessionModel
+from ..schemas import UsageSummary
+from ..services.usage import estimate_cost
+
+router = APIRouter(prefix="/usage", tags=["usage"])
+
+TOKEN_COLUMNS = [
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+]
+
+
+@router.get("/", response_model=List[UsageSummary])
+async def get_usage(
+    group_by: Literal["session", "case_study", "day", "route"] = "day",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    case_study_id: int | None = None,
+    session_id: int | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """LLM token usage, cost and latency of assistant replies, aggregated."""
+    key = {
+        "session": ChatMessageModel.session_id,
+        "case_study": SessionModel.case_study_id,
+        # date() returns text on SQLite but a date on PostgreSQL
+        "day": cast(func.date(ChatMessageModel.timestamp), String),
+        "route": ChatMessageModel.route,
+    }[group_by]
+    query = (
+        select(
+            key,
+            ChatMessageModel.model,
+            func.count(ChatMessageModel.id),
+            *(
+                func.coalesce(func.sum(getattr(ChatMessageModel, column)), 0)
+                for column in TOKEN_COLUMNS
+            ),
+            func.count(ChatMessageModel.ttft_ms),
+            func.sum(ChatMessageModel.ttft_ms),
+            func.count(ChatMessageModel.duration_ms),
+            func.sum(ChatMessageModel.duration_ms),
+        )
+        .join(SessionModel, SessionModel.id == ChatMessageModel.session_id)
+        .where(
+            ChatMessageModel.role == "assistant",
+            ChatMessageModel.model.isnot(None),
+        )
+    )
+    if since is not None:
+        query = query.where(ChatMessageModel.timestamp >= since)
+    if until is not None:
+        query = query.where(ChatMessageModel.timestamp < until)
+    if case_study_id is not None:
+        query = query.where(SessionModel.case_study_id == case_study_id)
+    if session_id is not None:
+        query = query.where(ChatMessageModel.session_id == session_id)
+
+    # Rows are per key and model so cost can be priced per model
+    summaries: Dict[int | str, Dict] = {}
+    latency: Dict[int | str, List[int]] = {}
+    rows = await db.execute(query.group_by(key, ChatMessageModel.model))
+    for row in rows.all():
+        group, model, messages, *tokens = row[:7]
+        ttft_count, ttft_sum, duration_count, duration_sum = row[7:]
+        summary = summaries.setdefault(
+            group,
+            {
+                "key": group,
+                "messages": 0,
+                "models": [],
+                "cost_usd": None,
+                **{column: 0 for column in TOKEN_COLUMNS},
+            },
+        )
+        summary["messages"] += messages
+        summary["models"].append(model)
+        for column, count in zip(TOKEN_COLUMNS, tokens):
+            summary[column] += count
+        cost = estimate_cost(model, *tokens)
+        if cost is not None:
+            summary["cost_usd"] = (summary["cost_usd"] or 0) + cost
+
+        totals = latency.setdefault(group, [0, 0, 0, 0])
+        totals[0] += ttft_count
+        totals[1] += ttft_sum or 0
+        totals[2] += duration_count
+        totals[3] += duration_sum or 0
+
+    for group, (ttft_count, ttft_sum, duration_count, duration_sum) in latency.items():
+        summaries[group]["avg_ttft_ms"] = ttft_sum / ttft_count if ttft_count else None
+        summaries[group]["avg_duration_ms"] = (
+            duration_sum / duration_count if duration_count else None
+        )
+    return [summaries[group] for group in sorted(summaries, key=str)]
@@ -86,6 +86,7 @@ class ChatMessage(ChatMessageBase):
     id: int
     session_id: int
     timestamp: datetime
+    status: str | None = None
 
     class Config:
         from_attributes = True
@@ -110,3 +111,16 @@ class Session(SessionBase):
 
     class Config:
         from_attributes = True
+
+
+class UsageSummary(BaseModel):
+    key: int | str | None  # Session id, case study id, day or route name
+    messages: int
+    models: List[str]
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+    cost_usd: float | None = None  # None if no message has a priced model
+    avg_ttft_ms: float | None = None
+    avg_duration_ms: float | None = None
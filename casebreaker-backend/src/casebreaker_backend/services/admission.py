@@ -0,0 +1,132 @@
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncGenerator, AsyncIterator
+import asyncio
+
+from ..config import get_settings
+from .metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """Raised when the wait queue for LLM calls is full."""
+
+
+@dataclass(eq=False)
+class Ticket:
+    device_id: str
+    admitted: bool = False
+    released: bool = False
+    queued_at: float = field(default_factory=lambda: asyncio.get_running_loop().time())
+
+
+class AdmissionController:
+    """
+    Limits how many LLM calls run at once.
+
+    Requests beyond max_concurrent wait in a bounded FIFO queue; when it is
+    full new requests are rejected. A device never holds more than
+    max_per_device slots: its extra requests wait while other devices' queued
+    requests are admitted ahead of them.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, max_per_device: int = 1):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_per_device = max_per_device
+        self.active = 0
+        self._active_by_device: Counter = Counter()
+        self._queue: deque = deque()
+        self._changed = asyncio.Event()
+
+    @property
+    def queue_length(self) -> int:
+        return len(self._queue)
+
+    def check(self, device_id: str):
+        """Raise AdmissionRejected if a request from device_id would be shed."""
+        if len(self._queue) >= self.max_queue and not self._can_admit(device_id):
+            metrics.incr("admission_rejected")
+            raise AdmissionRejected(
+                "Too many students are chatting right now, please try again shortly"
+            )
+
+    def enqueue(self, device_id: str) -> Ticket:
+        """Queue a request, admitting it straight away if a slot is free."""
+        self.check(device_id)
+        ticket = Ticket(device_id)
+        self._queue.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position of a waiting ticket, 0 once admitted."""
+        return 0 if ticket.admitted else self._queue.index(ticket) + 1
+
+    async def wait(self, ticket: Ticket) -> AsyncGenerator[int, None]:
+        """Wait for admission, yielding the queue position whenever it changes."""
+        last_position = None
+        while not ticket.admitted:
+            position = self.position(ticket)
+            if position != last_position:
+                yield position
+                last_position = position
+            await self._changed.wait()
+        metrics.observe(
+            "admission_wait", asyncio.get_running_loop().time() - ticket.queued_at
+        )
+
+    @asynccontextmanager
+    async def slot(self, device_id: str) -> AsyncIterator[None]:
+        """Hold an LLM slot for the block, for calls no client waits on."""
+        ticket = self.enqueue(device_id)
+        try:
+            async for _ in self.wait(ticket):
+                pass
+            yield
+        finally:
+            self.release(ticket)
+
+    def release(self, ticket: Ticket):
+        """Free a ticket's slot, or drop it from the queue if still waiting."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if ticket.admitted:
+            self.active -= 1
+            self._active_by_device[ticket.device_id] -= 1
+            if not self._active_by_device[ticket.device_id]:
+                del self._active_by_device[ticket.device_id]
+        else:
+            self._queue.remove(ticket)
+        self._dispatch(changed=True)
+
+    def _can_admit(self, device_id: str) -> bool:
+        return (
+            self.active < self.max_concurrent
+            and self._active_by_device[device_id] < self.max_per_device
+        )
+
+    def _dispatch(self, changed: bool = False):
+        for ticket in list(self._queue):
+            if self.active >= self.max_concurrent:
+                break
+            if self._active_by_device[ticket.device_id] >= self.max_per_device:
+                continue
+            self._queue.remove(ticket)
+            ticket.admitted = True
+            self.active += 1
+            self._active_by_device[ticket.device_id] += 1
+            changed = True
+        if changed:
+            # Wake every waiter so it can report its new position
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+
+settings = get_settings()
+admission_controller = AdmissionController(
+    max_concurrent=settings.LLM_MAX_CONCURRENT,
+    max_queue=settings.LLM_MAX_QUEUE,
+    max_per_device=settings.LLM_MAX_PER_DEVICE,
+)
@@ -0,0 +1,91 @@
+from typing import List, Tuple
+import re
+
+CHECKPOINT_MARKER = "[CHECKPOINTS_COMPLETED]"
+
+# Admin command completing a checkpoint, e.g. "DEUS-3"
+ADMIN_COMMAND = re.compile(r"\s*DEUS-(\S+)\s*")
+
+# The marker is always followed by a bracketed, comma separated list of ids.
+_MARKER_OPEN = CHECKPOINT_MARKER + "["
+
+# Give up on an id list that never closes instead of buffering forever.
+MAX_IDS_LENGTH = 256
+
+
+class CheckpointMarkerParser:
+    """
+    Streaming detector for "[CHECKPOINTS_COMPLETED][id1, id2]" markers.
+
+    Each delta is scanned once. Text that could be the start of a marker is
+    held back until it either completes the marker (and is dropped) or stops
+    matching (and is released), so marker bytes never reach the client.
+    """
+
+    def __init__(self):
+        self._pending = ""
+        self._ids: List[str] | None = None
+        self._ids_length = 0
+
+    def feed(self, text: str) -> Tuple[str, List[str]]:
+        """Consume a delta, returning the visible text and any completed ids."""
+        visible = []
+        completed = []
+        i = 0
+        while i < len(text):
+            if self._ids is not None:
+                end = text.find("]", i)
+                part = text[i:] if end == -1 else text[i:end]
+                self._ids.append(part)
+                self._ids_length += len(part)
+                if end == -1:
+                    if self._ids_length > MAX_IDS_LENGTH:
+                        visible.append(self.flush())
+                    break
+                completed.extend(
+                    checkpoint_id.strip()
+                    for checkpoint_id in "".join(self._ids).split(",")
+                    if checkpoint_id.strip()
+                )
+                self._ids = None
+                i = end + 1
+            elif self._pending:
+                remaining = _MARKER_OPEN[len(self._pending) :]
+                part = text[i : i + len(remaining)]
+                if remaining.startswith(part):
+                    self._pending += part
+                    i += len(part)
+                    if self._pending == _MARKER_OPEN:
+                        self._pending = ""
+                        self._ids = []
+                        self._ids_length = 0
+                else:
+                    # The only "[" a partial match can hold is its first
+                    # character, so the held text is plain text again.
+                    visible.append(self._pending)
+                    self._pending = ""
+            else:
+                start = text.find("[", i)
+                if start == -1:
+                    visible.append(text[i:])
+                    break
+                visible.append(text[i:start])
+                self._pending = "["
+                i = start + 1
+        return "".join(visible), completed
+
+    def flush(self) -> str:
+        """Release any held-back text at the end of the stream."""
+        held = self._pending
+        if self._ids is not None:
+            held = _MARKER_OPEN + "".join(self._ids)
+        self._pending = ""
+        self._ids = None
+        self._ids_length = 0
+        return held
+
+
+def parse_admin_command(content: str) -> str | None:
+    """The checkpoint id of a "DEUS-<id>" admin command, or None."""
+    match = ADMIN_COMMAND.fullmatch(content)
+    return match.group(1) if match else None
@@ -1,48 +1,66 @@
-from typing import AsyncGenerator, List, Dict, Any
-import json
-import anthropic
-from fastapi import HTTPException
+from collections import OrderedDict
+from typing import AsyncGenerator, List, Dict, Any, Tuple
 from ..config import get_settings
+from .events import StreamEvent, StartEvent, EndEvent, StatusEvent
+from .metrics import metrics
+from .providers import LLMProvider, get_llm_provider
 from rich import print
 
-settings = get_settings()
+# Rendered system prompts kept per (case study id, last_updated)
+SYSTEM_PROMPT_CACHE_SIZE = 256
 
-
-def format_sse(data: str, event: str | None = None) -> str:
-    """Format data into SSE format"""
-    msg = f"data: {json.dumps(data)}\n"
-    if event is not None:
-        msg = f"event: {event}\n{msg}"
-    return f"{msg}\n"
+# Case study fields that change from turn to turn. They are sent in a block
+# after the system prompt, so the cached prefix stays the same all session.
+TURN_FIELDS = ("checkpoints", "selected_context")
 
 
 class ClaudeService:
-    def __init__(self):
-        self.client = anthropic.Client(api_key=settings.CLAUDE_API_KEY)
-        self.model = "claude-3-opus-20240229"
-
-    async def generate_response(
-        self,
-        messages: List[Dict[str, str]],
-        case_study: Dict[str, Any],
-    ) -> AsyncGenerator[str, None]:
+    def __init__(self, provider: LLMProvider | None = None):
+        settings = get_settings()
+        self._provider = provider
+        self.model = settings.CLAUDE_MODEL
+        self.max_tokens = settings.CLAUDE_MAX_TOKENS
+        self.prompt_caching = settings.PROMPT_CACHING
+        self._system_prompts: OrderedDict[Tuple[Any, Any], str] = OrderedDict()
+
+    @property
+    def provider(self) -> LLMProvider:
+        """The configured LLM provider, created on first use."""
+        if self._provider is None:
+            self._provider = get_llm_provider()
+        return self._provider
+
+    @provider.setter
+    def provider(self, provider: LLMProvider):
+        self._provider = provider
+
+    def build_system_prompt(self, case_study: Dict[str, Any]) -> str:
         """
-        Generate a streaming response from Claude based on the conversation history
-        and case study context.
+        Render the system prompt for a case study, without the fields in
+        TURN_FIELDS.
+
+        Prompts are cached per case study, keyed on its id and last_updated,
+        so an edited case study is rendered afresh.
         """
-        # Convert messages to Claude format
-        claude_messages = []
-        for msg in messages:
-            role = "assistant" if msg["role"] == "assistant" else "user"
-            claude_messages.append({"role": role, "content": msg["content"]})
+        key = (case_study.get("id"), case_study.get("last_updated"))
+        if key[0] is not None and key in self._system_prompts:
+            self._system_prompts.move_to_end(key)
+            metrics.incr("system_prompt_cache_hits")
+            return self._system_prompts[key]
+        metrics.incr("system_prompt_cache_misses")
 
         # Create system prompt with case study context
+        case_study = {
+            name: value
+            for name, value in case_study.items()
+            if name not in ("id", "last_updated", "context_variant", *TURN_FIELDS)
+        }
         system_prompt = f"""
             You are an expert tutor helping a student work through a case study.
 
             Case study with all the context information: {case_study}
 
-            The goal is to solve all checkpoints listed in the case study.
+            The goal is to solve all checkpoints listed after the case study.
             You must not tell the student the exact solution, but your job is to use socratic questioning to help them discover the asnwers.
             If any of the checkpoints are completed you should mark it the end of your current message with "[CHECKPOINTS_COMPLETED][ID_OF_CHECKPOINT_1, ID_OF_CHECKPOINT_2]".
 
@@ -61,56 +79,77 @@ class ClaudeService:
             There will be an admin password for testing and development. If the user tells you "DEUS-ID" you automatically reply with the checkpoint marked as completed with the given ID and only that, nothing else. For example DEUS-1 will return [CHECKPOINTS_COMPLETED][1] and nothing else. You don't even return the previous checkpoint ID, just the current one.
         """
 
-        try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                temperature=0.7,
-                system=system_prompt,
-                messages=claude_messages,
-                stream=True,
+        if key[0] is not None:
+            self._system_prompts[key] = system_prompt
+            if len(self._system_prompts) > SYSTEM_PROMPT_CACHE_SIZE:
+                self._system_prompts.popitem(last=False)
+        return system_prompt
+
+    def build_turn_prompt(self, case_study: Dict[str, Any]) -> str:
+        """Render the case study fields in TURN_FIELDS, sent after the system prompt."""
+        parts = []
+        if case_study.get("selected_context"):
+            parts.append(
+                "Context materials relevant to this turn: "
+                f"{case_study['selected_context']}"
             )
+        checkpoints = case_study.get("checkpoints") or []
+        parts.append(f"Checkpoints still to solve: {checkpoints}")
+        return "\n\n".join(parts)
 
-            # Indicate that Claude is starting to think
-            yield format_sse(
+    async def generate_response(
+        self,
+        messages: List[Dict[str, str]],
+        case_study: Dict[str, Any],
+        model: str | None = None,
+        max_tokens: int | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """
+        Generate a streaming response from Claude based on the conversation history
+        and case study context. model and max_tokens default to the configured
+        ones. Provider errors are raised to the caller, which reports them on
+        the stream it sends to the client.
+        """
+        # Convert messages to Claude format
+        claude_messages = []
+        for msg in messages:
+            role = "assistant" if msg["role"] == "assistant" else "user"
+            claude_messages.append({"role": role, "content": msg["content"]})
+
+        system_prompt = self.build_system_prompt(case_study)
+        turn_prompt = self.build_turn_prompt(case_study)
+        system = f"{system_prompt}\n{turn_prompt}"
+        if self.prompt_caching:
+            # Let the provider cache the case study prefix across turns; the
+            # open checkpoints and selected context follow it uncached
+            system = [
                 {
-                    "type": "status",
-                    "data": {
-                        "state": "thinking",
-                        "message": "Claude is analyzing the case study...",
-                    },
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"},
                 },
-                "status",
-            )
+                {"type": "text", "text": turn_prompt},
+            ]
 
-            # Start the response
-            yield format_sse({"type": "start", "data": ""}, "start")
+        # Indicate that Claude is starting to think
+        yield StatusEvent("thinking", "Claude is analyzing the case study...")
 
-            for chunk in response:
-                if chunk.type == "content_block_delta":
-                    yield format_sse(
-                        {"type": "chunk", "data": chunk.delta.text}, "chunk"
-                    )
+        # Start the response
+        yield StartEvent()
 
-            # Indicate that Claude has finished
-            yield format_sse(
-                {
-                    "type": "status",
-                    "data": {
-                        "state": "complete",
-                        "message": "Claude has completed the response",
-                    },
-                },
-                "status",
-            )
+        async for event in self.provider.stream(
+            system=system,
+            messages=claude_messages,
+            model=model or self.model,
+            max_tokens=max_tokens or self.max_tokens,
+            temperature=0.7,
+        ):
+            yield event
 
-            yield format_sse({"type": "end", "data": ""}, "end")
+        # Indicate that Claude has finished
+        yield StatusEvent("complete", "Claude has completed the response")
 
-        except Exception as e:
-            yield format_sse({"type": "error", "data": str(e)}, "error")
-            raise HTTPException(
-                status_code=500, detail=f"Error generating response: {str(e)}"
-            )
+        yield EndEvent()
 
 
 claude_service = ClaudeService()
@@ -0,0 +1,69 @@
+from contextlib import aclosing
+from typing import AsyncGenerator, AsyncIterator, List
+import asyncio
+
+from .events import StreamEvent, TextDelta
+
+
+async def coalesce_deltas(
+    events: AsyncIterator[StreamEvent], window_ms: float, max_bytes: int
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Merge consecutive TextDelta events into fewer, larger ones.
+
+    A batch is sent once window_ms have passed since its first delta or
+    max_bytes of text have accumulated, and any other event flushes the
+    pending text before being passed through. The next upstream event is
+    awaited in a task, so a batch goes out when its window ends even if the
+    provider is silent. A window of 0 disables coalescing.
+    """
+    if window_ms <= 0:
+        async with aclosing(events):
+            async for event in events:
+                yield event
+        return
+
+    loop = asyncio.get_running_loop()
+    pending: List[str] = []
+    pending_bytes = 0
+    deadline = 0.0
+    next_event: asyncio.Future | None = None
+    async with aclosing(events):
+        try:
+            while True:
+                if next_event is None:
+                    next_event = asyncio.ensure_future(anext(events))
+                timeout = max(0.0, deadline - loop.time()) if pending else None
+                done, _ = await asyncio.wait({next_event}, timeout=timeout)
+                if not done:
+                    # The window ended before the provider sent anything else
+                    yield TextDelta("".join(pending))
+                    pending, pending_bytes = [], 0
+                    continue
+
+                try:
+                    event = next_event.result()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    next_event = None
+                if isinstance(event, TextDelta):
+                    if not pending:
+                        deadline = loop.time() + window_ms / 1000
+                    pending.append(event.text)
+                    pending_bytes += len(event.text.encode())
+                    if pending_bytes < max_bytes and loop.time() < deadline:
+                        continue
+                if pending:
+                    yield TextDelta("".join(pending))
+                    pending, pending_bytes = [], 0
+                if not isinstance(event, TextDelta):
+                    yield event
+        finally:
+            # The source can only be closed once it is no longer running
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+                await asyncio.wait({next_event})
+
+    if pending:
+        yield TextDelta("".join(pending))
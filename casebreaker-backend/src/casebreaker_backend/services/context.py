@@ -0,0 +1,116 @@
+from typing import Any, Dict, List
+
+from .events import TextDelta, UsageEvent
+from .providers import LLMProvider
+from .usage import UsageTotals
+
+SUMMARY_SYSTEM_PROMPT = """
+    You maintain a running summary of a tutoring conversation about a case study.
+    Merge the previous summary with the new messages into one concise summary.
+    Keep what the student has established, open questions, misconceptions and
+    which checkpoints were discussed. Write plain prose, no preamble.
+"""
+
+# Stands in for the student's side of a conversation the tutor opened, so the
+# opening question stays in context behind a user message
+OPENING_TURN_PROMPT = "I'm starting this case study."
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def split_turns(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """Group messages into turns, each starting with a user message."""
+    turns = []
+    for msg in messages:
+        if msg["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(msg)
+    return turns
+
+
+def messages_to_fold(
+    messages: List[Dict[str, Any]], recent_turns: int, summary_every_turns: int
+) -> List[Dict[str, Any]]:
+    """
+    Messages that should be folded into the rolling summary.
+
+    Summaries are batched: nothing is folded until the unsummarized history
+    exceeds recent_turns + summary_every_turns, then everything but the last
+    recent_turns turns is folded at once.
+    """
+    turns = split_turns(messages)
+    if len(turns) <= recent_turns + summary_every_turns:
+        return []
+    return [msg for turn in turns[: len(turns) - recent_turns] for msg in turn]
+
+
+def build_context(
+    messages: List[Dict[str, Any]], summary: str | None, token_budget: int
+) -> List[Dict[str, str]]:
+    """
+    Build the messages sent to the model for this turn.
+
+    Drops the oldest turns until the summary plus the remaining messages fit
+    the token budget (the latest turn is always kept), and carries the summary
+    in front of the first user message. A conversation opened by the tutor
+    gets OPENING_TURN_PROMPT in front of the opening message.
+    """
+    turns = split_turns(messages)
+    # The model expects the conversation to open with a user message
+    if turns and turns[0][0]["role"] != "user":
+        turns[0] = [{"role": "user", "content": OPENING_TURN_PROMPT}, *turns[0]]
+
+    cost = estimate_tokens(summary) if summary else 0
+    costs = [sum(estimate_tokens(msg["content"]) for msg in turn) for turn in turns]
+    total = cost + sum(costs)
+    start = 0
+    while total > token_budget and start < len(turns) - 1:
+        total -= costs[start]
+        start += 1
+
+    context = [
+        {"role": msg["role"], "content": msg["content"]}
+        for turn in turns[start:]
+        for msg in turn
+    ]
+    if summary and context:
+        context[0]["content"] = (
+            f"(Summary of our earlier conversation: {summary})\n\n"
+            f"{context[0]['content']}"
+        )
+    return context
+
+
+async def summarize_messages(
+    provider: LLMProvider,
+    previous_summary: str | None,
+    messages: List[Dict[str, Any]],
+    model: str,
+    max_tokens: int,
+    usage: UsageTotals | None = None,
+) -> str:
+    """
+    Fold messages into the previous summary using the LLM provider, adding
+    the tokens used to usage if given.
+    """
+    transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+    prompt = (
+        f"Previous summary:\n{previous_summary or '(none)'}\n\n"
+        f"New messages:\n{transcript}"
+    )
+    parts = []
+    async for event in provider.stream(
+        system=SUMMARY_SYSTEM_PROMPT,
+        messages=[{"role": "user", "content": prompt}],
+        model=model,
+        max_tokens=max_tokens,
+        temperature=0,
+    ):
+        if isinstance(event, TextDelta):
+            parts.append(event.text)
+        elif isinstance(event, UsageEvent) and usage is not None:
+            usage.add(event)
+    return "".join(parts).strip()
@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field
+from typing import Any, ClassVar, List
+import json
+
+
+def format_sse(data: Any, event: str | None = None) -> str:
+    """Format data into SSE format"""
+    msg = f"data: {json.dumps(data)}\n"
+    if event is not None:
+        msg = f"event: {event}\n{msg}"
+    return f"{msg}\n"
+
+
+@dataclass
+class StreamEvent:
+    """
+    A typed event produced while streaming a response.
+
+    Services yield these objects; they are encoded to SSE exactly once, at the
+    HTTP edge, via to_sse().
+    """
+
+    event: ClassVar[str]
+
+    def payload(self) -> Any:
+        return ""
+
+    def to_sse(self) -> str:
+        return format_sse({"type": self.event, "data": self.payload()}, self.event)
+
+
+@dataclass
+class StartEvent(StreamEvent):
+    event: ClassVar[str] = "start"
+
+
+@dataclass
+class EndEvent(StreamEvent):
+    event: ClassVar[str] = "end"
+
+
+@dataclass
+class TextDelta(StreamEvent):
+    event: ClassVar[str] = "chunk"
+
+    text: str
+
+    def payload(self) -> Any:
+        return self.text
+
+
+@dataclass
+class StatusEvent(StreamEvent):
+    event: ClassVar[str] = "status"
+
+    state: str
+    message: str
+
+    def payload(self) -> Any:
+        return {"state": self.state, "message": self.message}
+
+
+@dataclass
+class CheckpointEvent(StreamEvent):
+    """Checkpoints completed by this response, with the session's progress."""
+
+    event: ClassVar[str] = "checkpoint"
+
+    completed: List[str]
+    completed_checkpoints: List[str]
+    total: int
+
+    def payload(self) -> Any:
+        return {
+            "completed": self.completed,
+            "completed_checkpoints": self.completed_checkpoints,
+            "total": self.total,
+        }
+
+
+@dataclass
+class ProgressEvent(StreamEvent):
+    """A session's checkpoint progress, for progress subscribers."""
+
+    event: ClassVar[str] = "progress"
+
+    session_id: int
+    completed_checkpoints: List[str]
+    total: int
+    completed: List[str] = field(default_factory=list)
+
+    def payload(self) -> Any:
+        return {
+            "session_id": self.session_id,
+            "completed": self.completed,
+            "completed_checkpoints": self.completed_checkpoints,
+            "total": self.total,
+        }
+
+
+@dataclass
+class UsageEvent(StreamEvent):
+    """Token usage reported by the provider, for server-side accounting."""
+
+    event: ClassVar[str] = "usage"
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    stop_reason: str | None = None  # On the final event, e.g. "max_tokens"
+
+    def payload(self) -> Any:
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "stop_reason": self.stop_reason,
+        }
+
+
+@dataclass
+class ErrorEvent(StreamEvent):
+    event: ClassVar[str] = "error"
+
+    message: str
+
+    def payload(self) -> Any:
+        return self.message
@@ -0,0 +1,69 @@
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Iterable
+import math
+import time
+
+# Timings keep a bounded window of recent samples for percentiles
+TIMING_WINDOW = 2048
+
+
+def percentile(values: Iterable[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 100]."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Metrics:
+    """In-process counters and timings, exposed through GET /metrics."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timing_counts: Dict[str, int] = defaultdict(int)
+        self._timing_totals: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, deque] = defaultdict(
+            lambda: deque(maxlen=TIMING_WINDOW)
+        )
+
+    def incr(self, name: str, value: float = 1):
+        self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        self._timing_counts[name] += 1
+        self._timing_totals[name] += seconds
+        self._timings[name].append(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def counter(self, name: str) -> float:
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict:
+        return {
+            "counters": dict(self._counters),
+            "timings": {
+                name: {
+                    "count": self._timing_counts[name],
+                    "total": self._timing_totals[name],
+                    "p50": percentile(samples, 50),
+                    "p95": percentile(samples, 95),
+                    "p99": percentile(samples, 99),
+                }
+                for name, samples in self._timings.items()
+            },
+        }
+
+
+metrics = Metrics()
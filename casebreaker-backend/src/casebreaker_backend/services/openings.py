@@ -0,0 +1,143 @@
+from datetime import datetime
+from typing import Any, AsyncGenerator, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import CaseStudy, OpeningMessage
+from .checkpoints import CheckpointMarkerParser
+from .claude import claude_service
+from .events import StreamEvent, TextDelta, UsageEvent
+from .admission import admission_controller
+from .metrics import metrics
+from .usage import UsageTotals, record_usage
+
+# Stands in for the student's first message when generating an opening
+OPENING_PROMPT = (
+    "I'm starting this case study. Welcome me, briefly set the scene and "
+    "open the discussion with a question about the checkpoint: {checkpoint}."
+)
+
+# Admission control key for prewarm calls, so they take one slot at a time
+PREWARM_DEVICE_ID = "opening-prewarm"
+
+
+def case_study_context(case_study: CaseStudy) -> Dict[str, Any]:
+    """The case study fields the system prompt is rendered from."""
+    return {
+        "id": case_study.id,
+        "last_updated": case_study.last_updated,
+        "title": case_study.title,
+        "description": case_study.description,
+        "learning_objectives": case_study.learning_objectives,
+        "context_materials": case_study.context_materials,
+        "checkpoints": case_study.checkpoints,
+    }
+
+
+def opening_checkpoint(case_study: CaseStudy, completed: List[str] | None) -> str:
+    """Id of the first checkpoint not completed yet, or "" once all are done."""
+    for checkpoint in case_study.checkpoints or []:
+        if checkpoint["id"] not in (completed or []):
+            return checkpoint["id"]
+    return ""
+
+
+def opening_prompt(case_study: CaseStudy, checkpoint_id: str) -> str:
+    titles = {cp["id"]: cp.get("title", cp["id"]) for cp in case_study.checkpoints or []}
+    return OPENING_PROMPT.format(checkpoint=titles.get(checkpoint_id, "the case overall"))
+
+
+async def find_opening(
+    db: AsyncSession, case_study: CaseStudy, checkpoint_id: str
+) -> OpeningMessage | None:
+    return await db.scalar(
+        select(OpeningMessage).where(
+            OpeningMessage.case_study_id == case_study.id,
+            OpeningMessage.checkpoint_id == checkpoint_id,
+        )
+    )
+
+
+async def get_cached_opening(
+    db: AsyncSession, case_study: CaseStudy, checkpoint_id: str
+) -> str | None:
+    """The stored opening, unless the case study has changed since."""
+    opening = await find_opening(db, case_study, checkpoint_id)
+    if opening is None or opening.case_study_updated != case_study.last_updated:
+        metrics.incr("opening_cache_misses")
+        return None
+    metrics.incr("opening_cache_hits")
+    return opening.content
+
+
+async def store_opening(
+    db: AsyncSession, case_study: CaseStudy, checkpoint_id: str, content: str
+):
+    """Save an opening, replacing one generated for an older case study version."""
+    opening = await find_opening(db, case_study, checkpoint_id)
+    if opening is None:
+        opening = OpeningMessage(case_study_id=case_study.id, checkpoint_id=checkpoint_id)
+        db.add(opening)
+    opening.content = content
+    opening.case_study_updated = case_study.last_updated
+    opening.created_at = datetime.utcnow()
+    await db.commit()
+
+
+async def stream_opening(
+    case_study: CaseStudy, checkpoint_id: str, usage: UsageTotals | None = None
+) -> AsyncGenerator[StreamEvent, None]:
+    """
+    Generate an opening message, yielding events ready for the client.
+
+    Checkpoint markers are stripped and usage events are added to usage
+    instead of being yielded.
+    """
+    marker_parser = CheckpointMarkerParser()
+    async for event in claude_service.generate_response(
+        messages=[{"role": "user", "content": opening_prompt(case_study, checkpoint_id)}],
+        case_study=case_study_context(case_study),
+    ):
+        if isinstance(event, TextDelta):
+            visible, _ = marker_parser.feed(event.text)
+            if visible:
+                yield TextDelta(visible)
+            continue
+        held = marker_parser.flush()
+        if held:
+            yield TextDelta(held)
+        if isinstance(event, UsageEvent):
+            if usage is not None:
+                usage.add(event)
+        else:
+            yield event
+
+
+async def prewarm_openings(db: AsyncSession, case_studies: List[CaseStudy]) -> int:
+    """
+    Generate the missing or stale openings for case_studies, one at a time.
+
+    Each call waits for an admission slot like a student's would; raises
+    AdmissionRejected if the queue is full.
+    """
+    generated = 0
+    for case_study in case_studies:
+        checkpoint_ids = [cp["id"] for cp in case_study.checkpoints or []] or [""]
+        for checkpoint_id in checkpoint_ids:
+            if await get_cached_opening(db, case_study, checkpoint_id) is not None:
+                continue
+            usage = UsageTotals()
+            async with admission_controller.slot(PREWARM_DEVICE_ID):
+                parts = [
+                    event.text
+                    async for event in stream_opening(case_study, checkpoint_id, usage)
+                    if isinstance(event, TextDelta)
+                ]
+            # Not tied to a session, so counted rather than put on a message
+            record_usage("opening_prewarm", claude_service.model, usage)
+            content = "".join(parts).strip()
+            if content:
+                await store_opening(db, case_study, checkpoint_id, content)
+                generated += 1
+    return generated
@@ -0,0 +1,87 @@
+from collections import defaultdict
+from typing import Dict, Iterable, Set, Tuple
+import asyncio
+
+from .events import StreamEvent
+from .metrics import metrics
+
+
+def session_topic(session_id: int) -> str:
+    return f"session:{session_id}"
+
+
+def device_topic(device_id: str) -> str:
+    return f"device:{device_id}"
+
+
+class ProgressHub:
+    """
+    In-process pub/sub for session progress.
+
+    Each subscriber gets a bounded queue; a subscriber that falls behind loses
+    its oldest events rather than slowing down publishers. Subscribers on
+    another event loop than the publisher's, such as a test client's, are
+    handed events through that loop. Subscribers only see events published by
+    the same process.
+    """
+
+    def __init__(self, queue_size: int = 64):
+        self.queue_size = queue_size
+        self._subscribers: Dict[
+            str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = defaultdict(set)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    def publish(self, topics: Iterable[str], event: StreamEvent):
+        """Send an event to everyone subscribed to any of topics."""
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for topic in topics:
+            for loop, queue in list(self._subscribers.get(topic, ())):
+                if loop is running:
+                    self._put(queue, event)
+                elif not loop.is_closed():
+                    loop.call_soon_threadsafe(self._put, queue, event)
+        metrics.incr("progress_events_published")
+
+    @staticmethod
+    def _put(queue: asyncio.Queue, event: StreamEvent):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def subscribe(self, topic: str) -> "Subscription":
+        """Start receiving events for topic; close the subscription when done."""
+        subscription = Subscription(self, topic)
+        self._subscribers[topic].add(subscription.key)
+        return subscription
+
+    def _unsubscribe(self, topic: str, key: Tuple[asyncio.AbstractEventLoop, asyncio.Queue]):
+        self._subscribers[topic].discard(key)
+        if not self._subscribers[topic]:
+            del self._subscribers[topic]
+
+
+class Subscription:
+    def __init__(self, hub: ProgressHub, topic: str):
+        self.hub = hub
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(hub.queue_size)
+        self.key = (asyncio.get_running_loop(), self.queue)
+
+    async def get(self, timeout: float) -> StreamEvent | None:
+        """The next event, or None if nothing arrives within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub._unsubscribe(self.topic, self.key)
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import AsyncGenerator, List, Dict, Any
+import asyncio
+import itertools
+import re
+
+import anthropic
+import anyio
+
+from ..config import get_settings
+from .events import StreamEvent, TextDelta, UsageEvent
+
+
+class LLMProvider(ABC):
+    """
+    Interface for streaming chat completions.
+
+    Implementations yield TextDelta events as text arrives and UsageEvent
+    events when the provider reports token usage. Errors are raised, not
+    yielded; the caller decides how to surface them.
+    """
+
+    name: str = ""
+
+    @abstractmethod
+    def stream(
+        self,
+        system: str | List[Dict[str, Any]],
+        messages: List[Dict[str, str]],
+        model: str,
+        max_tokens: int,
+        temperature: float = 0.7,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        """Stream the completion of messages as events."""
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, api_key: str | None):
+        if not api_key:
+            raise ValueError("CLAUDE_API_KEY must be set to use the anthropic provider")
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
+
+    async def stream(self, system, messages, model, max_tokens, temperature=0.7):
+        response = await self.client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            system=system,
+            messages=messages,
+            stream=True,
+        )
+
+        try:
+            async for chunk in response:
+                if chunk.type == "content_block_delta":
+                    yield TextDelta(chunk.delta.text)
+                elif chunk.type == "message_start":
+                    usage = chunk.message.usage
+                    yield UsageEvent(
+                        input_tokens=usage.input_tokens,
+                        output_tokens=usage.output_tokens,
+                        cache_creation_input_tokens=(
+                            usage.cache_creation_input_tokens or 0
+                        ),
+                        cache_read_input_tokens=usage.cache_read_input_tokens or 0,
+                    )
+                elif chunk.type == "message_delta":
+                    yield UsageEvent(
+                        output_tokens=chunk.usage.output_tokens,
+                        stop_reason=chunk.delta.stop_reason,
+                    )
+        finally:
+            # Closing the HTTP response makes Anthropic stop generating. Shield
+            # it so it still runs when the consumer was cancelled because the
+            # client disconnected.
+            with anyio.CancelScope(shield=True):
+                await response.close()
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local provider for load tests and offline development.
+
+    Streams a templated response word by word, waiting ttft_ms before the
+    first token and then pacing tokens at tokens_per_second. The template may
+    reference {last_message} and {turn}.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        response: str,
+        output_tokens: int = 0,
+        tokens_per_second: float = 0,
+        ttft_ms: int = 0,
+    ):
+        self.response = response
+        self.output_tokens = output_tokens
+        self.tokens_per_second = tokens_per_second
+        self.ttft_ms = ttft_ms
+
+    def render_tokens(self, messages: List[Dict[str, str]]) -> List[str]:
+        user_messages = [msg["content"] for msg in messages if msg["role"] == "user"]
+        text = self.response.format(
+            last_message=user_messages[-1] if user_messages else "",
+            turn=len(user_messages),
+        )
+        words = re.findall(r"\S+\s*", text) or [text]
+        if self.output_tokens <= 0:
+            return words
+        if not words[-1][-1:].isspace():
+            words[-1] += " "
+        return list(itertools.islice(itertools.cycle(words), self.output_tokens))
+
+    async def stream(self, system, messages, model, max_tokens, temperature=0.7):
+        tokens = self.render_tokens(messages)
+        stop_reason = "max_tokens" if len(tokens) > max_tokens else "end_turn"
+        tokens = tokens[:max_tokens]
+        prompt_chars = len(str(system)) + sum(len(msg["content"]) for msg in messages)
+        yield UsageEvent(input_tokens=prompt_chars // 4)
+
+        loop = asyncio.get_running_loop()
+        first_token_at = loop.time() + self.ttft_ms / 1000
+        for i, token in enumerate(tokens):
+            due = first_token_at
+            if self.tokens_per_second > 0:
+                due += i / self.tokens_per_second
+            # Schedule against the start time so pacing doesn't drift under load
+            await asyncio.sleep(max(0.0, due - loop.time()))
+            yield TextDelta(token)
+
+        yield UsageEvent(output_tokens=len(tokens), stop_reason=stop_reason)
+
+
+@lru_cache()
+def get_llm_provider() -> LLMProvider:
+    """Build the provider selected by LLM_PROVIDER."""
+    settings = get_settings()
+    if settings.LLM_PROVIDER == "anthropic":
+        return AnthropicProvider(settings.CLAUDE_API_KEY)
+    if settings.LLM_PROVIDER == "fake":
+        return FakeProvider(
+            response=settings.FAKE_LLM_RESPONSE,
+            output_tokens=settings.FAKE_LLM_OUTPUT_TOKENS,
+            tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+            ttft_ms=settings.FAKE_LLM_TTFT_MS,
+        )
+    raise ValueError(f"Unknown LLM_PROVIDER: {settings.LLM_PROVIDER}")
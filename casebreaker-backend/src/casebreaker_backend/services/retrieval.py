@@ -0,0 +1,141 @@
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Tuple
+import json
+import math
+import re
+
+from .metrics import metrics
+
+# Card indexes kept per (case study id, last_updated)
+INDEX_CACHE_SIZE = 256
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that "
+    "the their this to was were what when which who why will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        word for word in re.findall(r"[a-z0-9]+", text.lower()) if word not in STOPWORDS
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 over a small, fixed set of documents."""
+
+    def __init__(self, documents: List[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = [Counter(tokenize(doc)) for doc in documents]
+        self.lengths = [sum(doc.values()) for doc in self.documents]
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        frequencies = Counter(term for doc in self.documents for term in doc)
+        count = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (count - freq + 0.5) / (freq + 0.5))
+            for term, freq in frequencies.items()
+        }
+
+    def scores(self, query: str) -> List[float]:
+        terms = [term for term in set(tokenize(query)) if term in self.idf]
+        scores = []
+        for doc, length in zip(self.documents, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            scores.append(
+                sum(
+                    self.idf[term] * doc[term] * (self.k1 + 1) / (doc[term] + norm)
+                    for term in terms
+                    if term in doc
+                )
+            )
+        return scores
+
+    def top(self, query: str, k: int) -> List[int]:
+        """Indexes of the k best matching documents, best first."""
+        scores = self.scores(query)
+        # Ties keep document order, so an unmatched query keeps the first cards
+        return sorted(range(len(scores)), key=lambda i: (-scores[i], i))[:k]
+
+
+def context_cards(context_materials: Any) -> List[Dict[str, Any]]:
+    """
+    Split context materials into cards that can be selected individually.
+
+    Materials are either {"cards": [{"title", "description"}, ...]} or a
+    mapping of section name to content, which becomes one card per section.
+    """
+    if not isinstance(context_materials, dict):
+        return []
+    if isinstance(context_materials.get("cards"), list):
+        return context_materials["cards"]
+    return [
+        {"title": name, "description": content}
+        for name, content in context_materials.items()
+    ]
+
+
+def card_text(card: Any) -> str:
+    if isinstance(card, dict):
+        return " ".join(
+            value if isinstance(value, str) else json.dumps(value)
+            for value in card.values()
+        )
+    return str(card)
+
+
+_indexes: OrderedDict[Tuple[Any, Any], BM25Index] = OrderedDict()
+
+
+def card_index(case_study: Dict[str, Any], cards: List[Dict[str, Any]]) -> BM25Index:
+    """The BM25 index of a case study's cards, rebuilt when it is edited."""
+    key = (case_study.get("id"), case_study.get("last_updated"))
+    if key[0] is not None and key in _indexes:
+        _indexes.move_to_end(key)
+        return _indexes[key]
+    index = BM25Index([card_text(card) for card in cards])
+    if key[0] is not None:
+        _indexes[key] = index
+        if len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def select_context(
+    case_study: Dict[str, Any],
+    completed_checkpoints: List[str] | None,
+    latest_message: str,
+    max_cards: int,
+) -> Dict[str, Any]:
+    """
+    Trim a case study to what the current turn needs.
+
+    Completed checkpoints are dropped. When there are more than max_cards
+    context cards, only the max_cards that best match the current checkpoint
+    and the latest message are kept, in their original order, under
+    "selected_context" in place of "context_materials". The returned dict
+    carries a "context_variant" identifying the selection.
+    """
+    completed = set(completed_checkpoints or [])
+    remaining = [
+        cp for cp in case_study.get("checkpoints") or [] if cp["id"] not in completed
+    ]
+    selected = dict(case_study)
+    chosen = None
+
+    cards = context_cards(case_study.get("context_materials"))
+    if max_cards > 0 and len(cards) > max_cards:
+        current = remaining[0] if remaining else {}
+        query = " ".join(
+            [current.get("title", ""), current.get("description", ""), latest_message]
+        )
+        chosen = tuple(sorted(card_index(case_study, cards).top(query, max_cards)))
+        # The selection changes between turns, so it is kept apart from the
+        # case study content that is the same every turn
+        del selected["context_materials"]
+        selected["selected_context"] = {"cards": [cards[i] for i in chosen]}
+        metrics.incr("context_cards_dropped", len(cards) - len(chosen))
+
+    selected["checkpoints"] = remaining
+    selected["context_variant"] = (tuple(cp["id"] for cp in remaining), chosen)
+    return selected
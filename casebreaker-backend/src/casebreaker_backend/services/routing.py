@@ -0,0 +1,99 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from rich import print
+
+from ..config import get_settings
+from .metrics import metrics
+
+
+@dataclass
+class TurnFeatures:
+    """What the routing rules can look at for one chat turn."""
+
+    message_chars: int
+    difficulty: int | None
+    remaining_checkpoints: int
+    queue_length: int
+
+
+@dataclass
+class Route:
+    name: str
+    model: str
+    max_tokens: int
+
+
+# Condition name -> (feature, comparison)
+CONDITIONS = {
+    "max_message_chars": ("message_chars", "max"),
+    "min_message_chars": ("message_chars", "min"),
+    "max_difficulty": ("difficulty", "max"),
+    "min_difficulty": ("difficulty", "min"),
+    "max_remaining_checkpoints": ("remaining_checkpoints", "max"),
+    "min_remaining_checkpoints": ("remaining_checkpoints", "min"),
+    "min_queue_length": ("queue_length", "min"),
+}
+
+
+@dataclass
+class RoutingRule:
+    name: str
+    model: str
+    max_tokens: int | None = None  # The default route's when not set
+    when: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        unknown = set(self.when) - set(CONDITIONS)
+        if unknown:
+            raise ValueError(
+                f"Unknown conditions in routing rule {self.name}: {sorted(unknown)}"
+            )
+
+    def matches(self, features: TurnFeatures) -> bool:
+        for condition, limit in self.when.items():
+            feature, comparison = CONDITIONS[condition]
+            value = getattr(features, feature)
+            if value is None:
+                return False
+            if comparison == "max" and value > limit:
+                return False
+            if comparison == "min" and value < limit:
+                return False
+        return True
+
+
+class ModelRouter:
+    """
+    Picks the model and output budget for a chat turn.
+
+    Rules are tried in order and the first whose conditions all hold wins;
+    a rule without conditions always matches. Turns no rule matches use the
+    default route.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], default: Route):
+        self.rules = [RoutingRule(**rule) for rule in rules]
+        self.default = default
+
+    def route(self, features: TurnFeatures) -> Route:
+        route = self.default
+        for rule in self.rules:
+            if rule.matches(features):
+                route = Route(
+                    rule.name, rule.model, rule.max_tokens or self.default.max_tokens
+                )
+                break
+        metrics.incr(f"model_route_{route.name}")
+        print(
+            f"Routed turn to {route.model} (rule {route.name}, "
+            f"max_tokens {route.max_tokens}): {features}"
+        )
+        return route
+
+
+settings = get_settings()
+model_router = ModelRouter(
+    settings.MODEL_ROUTING_RULES,
+    default=Route("default", settings.CLAUDE_MODEL, settings.CLAUDE_MAX_TOKENS),
+)
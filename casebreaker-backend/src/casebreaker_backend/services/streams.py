@@ -0,0 +1,180 @@
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, Tuple
+import asyncio
+
+from ..config import get_settings
+
+
+class StreamNotFound(Exception):
+    """Raised when a Last-Event-ID does not match a stream that can be resumed."""
+
+
+class ResumableStream:
+    """
+    A response generated in a background task and fanned out to subscribers.
+
+    Every SSE frame is given an id of the form "<key>:<seq>" and kept in a
+    bounded ring buffer, so a client that reconnects with Last-Event-ID gets
+    the frames it missed and then follows the live stream. When the last
+    subscriber goes away the generation is cancelled after grace_seconds
+    unless someone reconnects.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        source: AsyncIterator[str],
+        buffer_size: int,
+        grace_seconds: float,
+    ):
+        self.key = key
+        self.frames: deque = deque(maxlen=buffer_size)
+        self.last_seq = 0
+        self.done = False
+        self.grace_seconds = grace_seconds
+        self._subscribers = 0
+        self._abandon_handle = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._run(source))
+
+    async def _run(self, source: AsyncIterator[str]):
+        try:
+            async for frame in source:
+                self.last_seq += 1
+                frame = f"id: {self.key}:{self.last_seq}\n{frame}"
+                self.frames.append((self.last_seq, frame))
+                self._notify()
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def can_resume_from(self, seq: int) -> bool:
+        """Whether every frame after seq is still buffered."""
+        first_buffered = self.frames[0][0] if self.frames else self.last_seq + 1
+        return seq + 1 >= first_buffered
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncGenerator[str, None]:
+        """Yield buffered frames after after_seq, then follow the live stream."""
+        self._subscribers += 1
+        if self._abandon_handle is not None:
+            self._abandon_handle.cancel()
+            self._abandon_handle = None
+        try:
+            cursor = after_seq
+            while True:
+                while cursor < self.last_seq:
+                    if not self.can_resume_from(cursor):
+                        # Fell behind the ring buffer; nothing sensible to send
+                        return
+                    cursor += 1
+                    yield self.frames[cursor - self.frames[0][0]][1]
+                if self.done:
+                    return
+                await self._changed.wait()
+        finally:
+            self._subscribers -= 1
+            if not self._subscribers and not self.done:
+                self._abandon_handle = asyncio.get_running_loop().call_later(
+                    self.grace_seconds, self._abandon
+                )
+
+    def _abandon(self):
+        self._abandon_handle = None
+        if not self._subscribers and not self.done:
+            self.task.cancel()
+
+
+class StreamRegistry:
+    """
+    In-process registry of resumable streams, keyed by "<session>-<message>".
+
+    Streams can also be registered under a per-session request key (an
+    Idempotency-Key or a fingerprint of the post) so retries of the same
+    request attach to the existing stream.
+    """
+
+    def __init__(self):
+        settings = get_settings()
+        self.buffer_size = settings.STREAM_RESUME_BUFFER
+        self.grace_seconds = settings.STREAM_RESUME_GRACE_SECONDS
+        self.ttl_seconds = settings.STREAM_RESUME_TTL_SECONDS
+        self._streams: Dict[str, ResumableStream] = {}
+        self._requests: Dict[Tuple[int, str], str] = {}
+        self._claims: Dict[Tuple[int, str], Tuple[asyncio.Lock, int]] = {}
+
+    @asynccontextmanager
+    async def claim(self, session_id: int, request_key: str):
+        """
+        Hold a request key while its stream is set up, so a concurrent retry
+        waits and then finds the stream instead of starting a second one.
+        """
+        request = (session_id, request_key)
+        lock, holders = self._claims.get(request, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._claims[request] = (lock, holders + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, holders = self._claims[request]
+            if holders == 1:
+                del self._claims[request]
+            else:
+                self._claims[request] = (lock, holders - 1)
+
+    def create(
+        self,
+        session_id: int,
+        message_id: int,
+        source: AsyncIterator[str],
+        request_key: str | None = None,
+    ) -> ResumableStream:
+        key = f"{session_id}-{message_id}"
+        stream = ResumableStream(key, source, self.buffer_size, self.grace_seconds)
+        self._streams[key] = stream
+        if request_key is not None:
+            self._requests[(session_id, request_key)] = key
+        stream.task.add_done_callback(
+            lambda _: self._expire_later(key, (session_id, request_key))
+        )
+        return stream
+
+    def _expire_later(self, key: str, request: Tuple[int, str | None]):
+        # Keep finished streams around briefly so late reconnects can replay
+        asyncio.get_running_loop().call_later(
+            self.ttl_seconds, self._expire, key, request
+        )
+
+    def _expire(self, key: str, request: Tuple[int, str | None]):
+        self._streams.pop(key, None)
+        # A newer stream may have taken over the request key since
+        if self._requests.get(request) == key:
+            del self._requests[request]
+
+    def find(self, session_id: int, request_key: str) -> ResumableStream | None:
+        """The stream registered for a request key, if it is still around."""
+        key = self._requests.get((session_id, request_key))
+        return self._streams.get(key) if key else None
+
+    def resume(self, session_id: int, last_event_id: str) -> Tuple[ResumableStream, int]:
+        """Find the stream a Last-Event-ID belongs to and the seq to resume after."""
+        key, _, seq = last_event_id.rpartition(":")
+        stream = self._streams.get(key)
+        if (
+            stream is None
+            or not key.startswith(f"{session_id}-")
+            or not seq.isdigit()
+            or not stream.can_resume_from(int(seq))
+        ):
+            raise StreamNotFound(
+                "This response can no longer be resumed, reload the conversation"
+            )
+        return stream, int(seq)
+
+
+stream_registry = StreamRegistry()
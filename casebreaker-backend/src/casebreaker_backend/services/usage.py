@@ -0,0 +1,91 @@
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Tuple
+
+from .events import UsageEvent
+from .metrics import metrics
+
+# USD per million tokens: input, output, cache write, cache read
+MODEL_PRICES: Dict[str, Tuple[float, float, float, float]] = {
+    "claude-3-opus-20240229": (15.0, 75.0, 18.75, 1.5),
+    "claude-3-5-sonnet-20241022": (3.0, 15.0, 3.75, 0.3),
+    "claude-3-5-haiku-20241022": (0.8, 4.0, 1.0, 0.08),
+    "claude-3-haiku-20240307": (0.25, 1.25, 0.3, 0.03),
+}
+
+
+@dataclass
+class UsageTotals:
+    """Token counts for one response, merged from the provider's usage events."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+    def add(self, event: UsageEvent):
+        # Providers report running totals, so keep the largest value seen
+        self.input_tokens = max(self.input_tokens, event.input_tokens)
+        self.output_tokens = max(self.output_tokens, event.output_tokens)
+        self.cache_creation_input_tokens = max(
+            self.cache_creation_input_tokens, event.cache_creation_input_tokens
+        )
+        self.cache_read_input_tokens = max(
+            self.cache_read_input_tokens, event.cache_read_input_tokens
+        )
+
+
+def estimate_cost(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    cache_creation_input_tokens: int = 0,
+    cache_read_input_tokens: int = 0,
+) -> float | None:
+    """Cost in USD at list prices, or None for a model without known prices."""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    tokens = (
+        input_tokens,
+        output_tokens,
+        cache_creation_input_tokens,
+        cache_read_input_tokens,
+    )
+    return sum(count * price for count, price in zip(tokens, prices)) / 1_000_000
+
+
+def usage_ledger(
+    model: str,
+    route: str,
+    usage: UsageTotals,
+    started_at: float | None,
+    first_token_at: float | None,
+    now: float,
+) -> Dict[str, Any]:
+    """The usage columns of an assistant ChatMessage; times are loop.time() values."""
+    return {
+        "model": model,
+        "route": route,
+        **asdict(usage),
+        "ttft_ms": (
+            round((first_token_at - started_at) * 1000)
+            if first_token_at is not None and started_at is not None
+            else None
+        ),
+        "duration_ms": (
+            round((now - started_at) * 1000) if started_at is not None else None
+        ),
+    }
+
+
+def record_usage(purpose: str, model: str, usage: UsageTotals):
+    """
+    Count the tokens and cost of an LLM call that has no assistant message to
+    carry its ledger, e.g. summaries, as "<purpose>_*" metrics counters.
+    """
+    metrics.incr(f"{purpose}_calls")
+    for name, value in asdict(usage).items():
+        metrics.incr(f"{purpose}_{name}", value)
+    cost = estimate_cost(model, **asdict(usage))
+    if cost is not None:
+        metrics.incr(f"{purpose}_cost_usd", cost)
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+from casebreaker_backend.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+
+
+def test_admits_up_to_max_concurrent():
+    """Test that requests beyond the limit wait in the queue."""
+
+    async def run():
+        controller = AdmissionController(max_concurrent=2, max_queue=10)
+        tickets = [controller.enqueue(f"device-{i}") for i in range(3)]
+        assert [t.admitted for t in tickets] == [True, True, False]
+        assert controller.position(tickets[2]) == 1
+
+        controller.release(tickets[0])
+        assert tickets[2].admitted
+        assert controller.active == 2
+
+    asyncio.run(run())
+
+
+def test_one_slot_per_device():
+    """Test that a device's second request waits behind other devices."""
+
+    async def run():
+        controller = AdmissionController(max_concurrent=3, max_queue=10)
+        first = controller.enqueue("greedy")
+        second = controller.enqueue("greedy")
+        other = controller.enqueue("other")
+        assert first.admitted and other.admitted
+        assert not second.admitted
+
+        controller.release(first)
+        assert second.admitted
+
+    asyncio.run(run())
+
+
+def test_rejects_when_queue_full():
+    """Test that requests are shed once the wait queue is full."""
+
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        controller.enqueue("a")
+        controller.enqueue("b")
+        with pytest.raises(AdmissionRejected):
+            controller.enqueue("c")
+
+    asyncio.run(run())
+
+
+def test_wait_reports_queue_position():
+    """Test that waiters see their position change until admitted."""
+
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=10)
+        running = controller.enqueue("a")
+        next_up = controller.enqueue("b")
+        waiting = controller.enqueue("c")
+
+        positions = []
+
+        async def wait():
+            async for position in controller.wait(waiting):
+                positions.append(position)
+
+        task = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+        controller.release(running)  # "b" is admitted, "c" moves up
+        await asyncio.sleep(0)
+        controller.release(next_up)  # "c" is admitted
+        await asyncio.wait_for(task, timeout=1)
+
+        assert positions == [2, 1]
+        assert waiting.admitted
+
+    asyncio.run(run())
@@ -129,3 +129,47 @@ def test_delete_case_study_not_found(client):
     """Test deleting a non-existent case study."""
     response = client.delete("/api/v1/case-studies/999")
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+def test_prewarm_opening_messages(
+    client, test_db, sample_case_study, fake_llm, prewarm_enabled
+):
+    """Test prewarming opening messages for the catalog."""
+    from casebreaker_backend.models import OpeningMessage
+    from casebreaker_backend.services.metrics import metrics
+
+    calls = metrics.counter("opening_prewarm_calls")
+    response = client.post("/api/v1/case-studies/openings/prewarm")
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.json()["case_studies"] == 1
+    assert test_db.query(OpeningMessage).count() == 1
+    assert metrics.counter("opening_prewarm_calls") == calls + 1
+
+    # Nothing is stale, so a second run generates nothing
+    response = client.post("/api/v1/case-studies/openings/prewarm")
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert metrics.counter("opening_prewarm_calls") == calls + 1
+
+def test_prewarm_opening_messages_waits_for_admission(
+    client, test_db, sample_case_study, fake_llm, prewarm_enabled, monkeypatch
+):
+    """Test that prewarm calls go through admission control."""
+    from casebreaker_backend.models import OpeningMessage
+    from casebreaker_backend.services import openings
+    from casebreaker_backend.services.admission import AdmissionController
+
+    # No free slot and no room in the queue: the prewarm is shed
+    controller = AdmissionController(max_concurrent=0, max_queue=0)
+    monkeypatch.setattr(openings, "admission_controller", controller)
+    response = client.post("/api/v1/case-studies/openings/prewarm")
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert test_db.query(OpeningMessage).count() == 0
+
+def test_prewarm_opening_messages_disabled(client, sample_case_study):
+    """Test that the prewarm endpoint is off unless enabled in settings."""
+    response = client.post("/api/v1/case-studies/openings/prewarm")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+def test_prewarm_opening_messages_not_found(client, prewarm_enabled):
+    """Test prewarming opening messages for a non-existent case study."""
+    response = client.post("/api/v1/case-studies/openings/prewarm?case_study_id=999")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,74 @@
+import pytest
+
+from casebreaker_backend.services.checkpoints import (
+    CheckpointMarkerParser,
+    MAX_IDS_LENGTH,
+    parse_admin_command,
+)
+
+
+def feed_all(parser, deltas):
+    visible = []
+    completed = []
+    for delta in deltas:
+        text, ids = parser.feed(delta)
+        visible.append(text)
+        completed.extend(ids)
+    visible.append(parser.flush())
+    return "".join(visible), completed
+
+
+def test_plain_text_passes_through():
+    """Test that text without a marker is emitted unchanged."""
+    text, completed = feed_all(CheckpointMarkerParser(), ["Hello ", "[world]", "!"])
+    assert text == "Hello [world]!"
+    assert completed == []
+
+
+def test_marker_in_single_delta():
+    """Test that a complete marker is stripped and its ids returned."""
+    text, completed = feed_all(
+        CheckpointMarkerParser(), ["Well done. [CHECKPOINTS_COMPLETED][1, 2]"]
+    )
+    assert text == "Well done. "
+    assert completed == ["1", "2"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_marker_split_across_deltas(size):
+    """Test that a marker split at any position is still detected."""
+    response = "Good. [CHECKPOINTS_COMPLETED][3] Next question?"
+    deltas = [response[i : i + size] for i in range(0, len(response), size)]
+    text, completed = feed_all(CheckpointMarkerParser(), deltas)
+    assert text == "Good.  Next question?"
+    assert completed == ["3"]
+
+
+def test_ids_returned_when_closing_bracket_arrives():
+    """Test that ids are reported by the delta carrying the closing bracket."""
+    parser = CheckpointMarkerParser()
+    assert parser.feed("[CHECKPOINTS_COMPLETED][4") == ("", [])
+    assert parser.feed("]") == ("", ["4"])
+
+
+def test_partial_marker_is_released_on_flush():
+    """Test that an unfinished marker prefix is not swallowed."""
+    parser = CheckpointMarkerParser()
+    assert parser.feed("see [CHECKPOINTS") == ("see ", [])
+    assert parser.flush() == "[CHECKPOINTS"
+
+
+def test_unterminated_id_list_is_bounded():
+    """Test that an id list that never closes is released as text."""
+    parser = CheckpointMarkerParser()
+    text, completed = parser.feed("[CHECKPOINTS_COMPLETED][" + "x" * (MAX_IDS_LENGTH + 1))
+    assert text.startswith("[CHECKPOINTS_COMPLETED][")
+    assert completed == []
+
+
+def test_parse_admin_command():
+    """Test recognising DEUS admin commands."""
+    assert parse_admin_command("DEUS-3") == "3"
+    assert parse_admin_command("  DEUS-cp_2\n") == "cp_2"
+    assert parse_admin_command("What does DEUS-3 mean?") is None
+    assert parse_admin_command("DEUS-") is None
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from casebreaker_backend.services.claude import ClaudeService
+from casebreaker_backend.services.metrics import metrics
+
+
+def make_case_study(last_updated):
+    return {
+        "id": 1,
+        "last_updated": last_updated,
+        "title": "Test Case Study",
+        "checkpoints": [{"id": "1", "title": "Test Checkpoint"}],
+    }
+
+
+def test_system_prompt_is_cached_per_case_study():
+    """Test that repeat turns reuse the rendered system prompt."""
+    service = ClaudeService()
+    last_updated = datetime(2025, 1, 1)
+    hits = metrics.counter("system_prompt_cache_hits")
+
+    first = service.build_system_prompt(make_case_study(last_updated))
+    second = service.build_system_prompt(make_case_study(last_updated))
+
+    assert first is second
+    assert "Test Case Study" in first
+    assert "last_updated" not in first
+    assert metrics.counter("system_prompt_cache_hits") == hits + 1
+
+
+def test_system_prompt_cache_invalidated_on_update():
+    """Test that editing a case study renders a fresh prompt."""
+    service = ClaudeService()
+    last_updated = datetime(2025, 1, 1)
+    case_study = make_case_study(last_updated)
+    first = service.build_system_prompt(case_study)
+
+    case_study = make_case_study(last_updated + timedelta(minutes=1))
+    case_study["title"] = "Edited Case Study"
+    second = service.build_system_prompt(case_study)
+
+    assert "Edited Case Study" in second
+    assert first != second
+
+
+def test_system_prompt_shared_across_context_variants():
+    """Test that the turn's checkpoints and cards stay out of the cached prompt."""
+    service = ClaudeService()
+    case_study = make_case_study(datetime(2025, 1, 1))
+    trimmed = {
+        **case_study,
+        "checkpoints": [],
+        "selected_context": {"cards": [{"title": "Test Card"}]},
+        "context_variant": ((), (0,)),
+    }
+
+    assert service.build_system_prompt(case_study) is service.build_system_prompt(
+        trimmed
+    )
+    assert "Test Checkpoint" not in service.build_system_prompt(case_study)
+    assert "Test Checkpoint" in service.build_turn_prompt(case_study)
+    turn_prompt = service.build_turn_prompt(trimmed)
+    assert "Test Checkpoint" not in turn_prompt
+    assert "Test Card" in turn_prompt
+
+
+def test_only_system_prompt_marked_for_caching(fake_llm):
+    """Test that the per-turn block follows the cached block without cache_control."""
+    import asyncio
+
+    service = ClaudeService(provider=fake_llm)
+    service.prompt_caching = True
+    systems = []
+    stream = fake_llm.stream
+
+    async def recording_stream(system, *args, **kwargs):
+        systems.append(system)
+        async for event in stream(system, *args, **kwargs):
+            yield event
+
+    fake_llm.stream = recording_stream
+
+    async def run():
+        messages = [{"role": "user", "content": "hello"}]
+        case_study = make_case_study(datetime(2025, 1, 1))
+        async for _ in service.generate_response(messages, case_study):
+            pass
+
+    asyncio.run(run())
+    cached, turn = systems[0]
+    assert cached["cache_control"] == {"type": "ephemeral"}
+    assert "Test Case Study" in cached["text"]
+    assert "cache_control" not in turn
+    assert "Test Checkpoint" in turn["text"]
@@ -0,0 +1,100 @@
+import asyncio
+
+from casebreaker_backend.services.coalesce import coalesce_deltas
+from casebreaker_backend.services.events import StatusEvent, TextDelta
+
+
+async def paced(events, delay=0):
+    for event in events:
+        await asyncio.sleep(delay)
+        yield event
+
+
+def collect(source, window_ms, max_bytes=256):
+    async def run():
+        return [event async for event in coalesce_deltas(source, window_ms, max_bytes)]
+
+    return asyncio.run(run())
+
+
+def test_coalesce_disabled_passes_events_through():
+    """Test that a zero window leaves the stream untouched."""
+    events = [TextDelta("a"), TextDelta("b"), StatusEvent("complete", "done")]
+    assert collect(paced(events), window_ms=0) == events
+
+
+def test_coalesce_merges_deltas_within_window():
+    """Test that deltas arriving within the window become one event."""
+    events = [TextDelta("Hel"), TextDelta("lo "), TextDelta("there")]
+    assert collect(paced(events), window_ms=1000) == [TextDelta("Hello there")]
+
+
+def test_coalesce_flushes_at_max_bytes():
+    """Test that a batch is sent once it reaches max_bytes."""
+    events = [TextDelta("abc")] * 4
+    assert collect(paced(events), window_ms=1000, max_bytes=6) == [
+        TextDelta("abcabc"),
+        TextDelta("abcabc"),
+    ]
+
+
+def test_coalesce_flushes_before_other_events():
+    """Test that status events flush pending text and are not delayed."""
+    events = [TextDelta("a"), TextDelta("b"), StatusEvent("complete", "done"), TextDelta("c")]
+    assert collect(paced(events), window_ms=1000) == [
+        TextDelta("ab"),
+        StatusEvent("complete", "done"),
+        TextDelta("c"),
+    ]
+
+
+def test_coalesce_closes_batch_after_window():
+    """Test that each batch is sent when its window ends."""
+    events = [TextDelta("a"), TextDelta("b"), TextDelta("c")]
+    assert collect(paced(events, delay=0.05), window_ms=10) == [
+        TextDelta("a"),
+        TextDelta("b"),
+        TextDelta("c"),
+    ]
+
+
+def test_coalesce_sends_batch_without_waiting_for_next_delta():
+    """Test that a silent provider does not hold text past the window."""
+    import time
+
+    async def source():
+        yield TextDelta("Hello ")
+        await asyncio.sleep(1)
+        yield TextDelta("world")
+
+    async def run():
+        start = time.perf_counter()
+        received = []
+        async for event in coalesce_deltas(source(), window_ms=30, max_bytes=256):
+            received.append((event, time.perf_counter() - start))
+        return received
+
+    (first, first_at), (second, _) = asyncio.run(run())
+    assert (first, second) == (TextDelta("Hello "), TextDelta("world"))
+    assert 0.025 <= first_at < 0.5
+
+
+def test_coalesce_closes_source_when_closed():
+    """Test that closing the coalesced stream closes the source."""
+    closed = []
+
+    async def source():
+        try:
+            while True:
+                await asyncio.sleep(0.001)
+                yield TextDelta("x")
+        finally:
+            closed.append(True)
+
+    async def run():
+        stream = coalesce_deltas(source(), window_ms=5, max_bytes=256)
+        await anext(stream)
+        await stream.aclose()
+
+    asyncio.run(run())
+    assert closed == [True]
@@ -0,0 +1,62 @@
+from casebreaker_backend.services.context import (
+    OPENING_TURN_PROMPT,
+    build_context,
+    messages_to_fold,
+    split_turns,
+)
+
+
+def make_history(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"id": 2 * i + 1, "role": "user", "content": f"question {i}"})
+        messages.append({"id": 2 * i + 2, "role": "assistant", "content": f"answer {i}"})
+    return messages
+
+
+def test_split_turns():
+    """Test that turns start at each user message."""
+    turns = split_turns(make_history(3))
+    assert len(turns) == 3
+    assert [msg["role"] for msg in turns[0]] == ["user", "assistant"]
+
+
+def test_messages_to_fold_is_batched():
+    """Test that nothing is folded until the batch threshold is passed."""
+    assert messages_to_fold(make_history(6), recent_turns=4, summary_every_turns=2) == []
+
+    fold = messages_to_fold(make_history(7), recent_turns=4, summary_every_turns=2)
+    assert [msg["id"] for msg in fold] == [1, 2, 3, 4, 5, 6]
+
+
+def test_build_context_prepends_summary():
+    """Test that the summary is carried on the first user message."""
+    context = build_context(make_history(2), "Student found the lactate", 10_000)
+    assert context[0]["role"] == "user"
+    assert context[0]["content"].startswith("(Summary of our earlier conversation")
+    assert context[0]["content"].endswith("question 0")
+    assert len(context) == 4
+
+
+def test_build_context_enforces_token_budget():
+    """Test that the oldest turns are dropped to fit the budget."""
+    history = make_history(10)
+    context = build_context(history, None, token_budget=12)
+    assert context[-1]["content"] == "answer 9"
+    assert len(context) < len(history)
+
+    # The latest turn is kept even if it alone exceeds the budget
+    context = build_context(history, None, token_budget=1)
+    assert [msg["content"] for msg in context] == ["question 9", "answer 9"]
+
+
+def test_build_context_starts_with_user_message():
+    """Test that a leading opening message is kept behind a user message."""
+    history = [{"id": 1, "role": "assistant", "content": "Welcome"}] + make_history(1)
+    context = build_context(history, None, 10_000)
+    assert context[0] == {"role": "user", "content": OPENING_TURN_PROMPT}
+    assert [msg["content"] for msg in context[1:]] == [
+        "Welcome",
+        "question 0",
+        "answer 0",
+    ]
@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import inspect, text
+
+from casebreaker_backend.database import (
+    create_database_engine,
+    engine_options,
+    async_database_url,
+    is_sqlite,
+    sync_database_url,
+)
+from .conftest import TEST_DATABASE_URL
+
+requires_postgres = pytest.mark.skipif(
+    TEST_DATABASE_URL is None or is_sqlite(TEST_DATABASE_URL),
+    reason="set TEST_DATABASE_URL to a PostgreSQL database",
+)
+
+
+def test_async_database_url():
+    """Test that database URLs are mapped to their async drivers."""
+    assert async_database_url("sqlite:///./casebreaker.db") == (
+        "sqlite+aiosqlite:///./casebreaker.db"
+    )
+    assert async_database_url("postgresql://user:pw@db/casebreaker") == (
+        "postgresql+asyncpg://user:pw@db/casebreaker"
+    )
+
+
+def test_sync_database_url():
+    """Test that URLs without a driver get the one the postgres extra installs."""
+    assert sync_database_url("postgresql://user:pw@db/casebreaker") == (
+        "postgresql+psycopg2://user:pw@db/casebreaker"
+    )
+    assert sync_database_url("postgresql+psycopg://db/casebreaker") == (
+        "postgresql+psycopg://db/casebreaker"
+    )
+    assert sync_database_url("sqlite:///./casebreaker.db") == "sqlite:///./casebreaker.db"
+
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """Test that new SQLite connections get the configured pragmas."""
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pragmas.db'}")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -64000
+    engine.dispose()
+
+
+def test_pool_options():
+    """Test that file databases are pooled per settings and memory ones are not."""
+    options = engine_options("sqlite:///./casebreaker.db")
+    assert (options["pool_size"], options["max_overflow"]) == (10, 10)
+    assert "pool_size" not in engine_options("sqlite://")
+
+
+@requires_postgres
+def test_jsonb_containment_queries(test_db, sample_session):
+    """Test that JSON columns are JSONB on Postgres and can be filtered in SQL."""
+    from casebreaker_backend.models import CaseStudy, Session
+
+    sample_session.completed_checkpoints = ["1"]
+    test_db.commit()
+
+    assert (
+        test_db.query(CaseStudy)
+        .filter(CaseStudy.checkpoints.contains([{"id": "1"}]))
+        .count()
+        == 1
+    )
+    assert (
+        test_db.query(Session)
+        .filter(Session.completed_checkpoints.contains(["1"]))
+        .count()
+        == 1
+    )
+    assert (
+        test_db.query(Session)
+        .filter(Session.completed_checkpoints.contains(["2"]))
+        .count()
+        == 0
+    )
+
+    indexes = {
+        index["name"] for index in inspect(test_db.get_bind()).get_indexes("sessions")
+    }
+    assert "ix_sessions_completed_checkpoints" in indexes
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from casebreaker_backend.services.events import ProgressEvent
+from casebreaker_backend.services.progress import ProgressHub
+
+
+def progress(*completed):
+    return ProgressEvent(session_id=1, completed_checkpoints=list(completed), total=3)
+
+
+def test_publish_reaches_topic_subscribers():
+    """Test that subscribers receive events for their topics only."""
+    hub = ProgressHub()
+
+    async def run():
+        session = hub.subscribe("session:1")
+        other = hub.subscribe("session:2")
+        hub.publish(["session:1", "device:a"], progress("1"))
+        received = await session.get(timeout=1)
+        missed = await other.get(timeout=0.01)
+        session.close()
+        other.close()
+        return received, missed
+
+    received, missed = asyncio.run(run())
+    assert received == progress("1")
+    assert missed is None
+    assert hub.subscriber_count("session:1") == 0
+
+
+def test_slow_subscriber_drops_oldest_events():
+    """Test that a full queue keeps the newest events."""
+    hub = ProgressHub(queue_size=2)
+
+    async def run():
+        subscription = hub.subscribe("session:1")
+        for i in range(4):
+            hub.publish(["session:1"], progress(str(i)))
+        events = [await subscription.get(timeout=1) for _ in range(2)]
+        subscription.close()
+        return events
+
+    assert asyncio.run(run()) == [progress("2"), progress("3")]
+
+
+def test_publish_from_worker_thread():
+    """Test that events published from another thread are delivered."""
+    hub = ProgressHub()
+
+    async def run():
+        subscription = hub.subscribe("session:1")
+        thread = threading.Thread(
+            target=hub.publish, args=(["session:1"], progress("1"))
+        )
+        thread.start()
+        event = await subscription.get(timeout=1)
+        thread.join()
+        subscription.close()
+        return event
+
+    assert asyncio.run(run()) == progress("1")
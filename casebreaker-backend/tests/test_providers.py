@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from casebreaker_backend.services.events import TextDelta, UsageEvent
+from casebreaker_backend.services.providers import FakeProvider, LLMProvider
+
+
+def collect(provider, messages, max_tokens=4096):
+    async def run():
+        return [
+            event
+            async for event in provider.stream(
+                system="system", messages=messages, model="fake", max_tokens=max_tokens
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def test_fake_provider_renders_template():
+    """Test that the fake provider streams its template word by word."""
+    provider = FakeProvider(response="Turn {turn}: {last_message}")
+    events = collect(provider, [{"role": "user", "content": "why?"}])
+
+    deltas = [event.text for event in events if isinstance(event, TextDelta)]
+    assert deltas == ["Turn ", "1: ", "why?"]
+    assert isinstance(events[0], UsageEvent)
+    assert events[-1].output_tokens == 3
+
+
+def test_fake_provider_output_tokens_and_max_tokens():
+    """Test that output_tokens repeats the template and max_tokens caps it."""
+    provider = FakeProvider(response="a b", output_tokens=5)
+    messages = [{"role": "user", "content": "x"}]
+
+    deltas = [e.text for e in collect(provider, messages) if isinstance(e, TextDelta)]
+    assert "".join(deltas) == "a b a b a "
+
+    events = collect(provider, messages, max_tokens=2)
+    assert len([e for e in events if isinstance(e, TextDelta)]) == 2
+
+
+def test_fake_provider_paces_tokens():
+    """Test that time-to-first-token and token rate are honoured."""
+    provider = FakeProvider(
+        response="x", output_tokens=6, tokens_per_second=100, ttft_ms=50
+    )
+    start = time.perf_counter()
+    collect(provider, [{"role": "user", "content": "x"}])
+    assert time.perf_counter() - start >= 0.05 + 5 / 100
+
+
+def test_incomplete_provider_fails_when_built():
+    """Test that a provider without stream() cannot be instantiated."""
+
+    class NoStreamProvider(LLMProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        NoStreamProvider()
@@ -0,0 +1,195 @@
+import asyncio
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert, text
+
+from casebreaker_backend.database import is_sqlite
+from .conftest import TEST_DATABASE_URL
+
+pytestmark = pytest.mark.skipif(
+    TEST_DATABASE_URL is not None and not is_sqlite(TEST_DATABASE_URL),
+    reason="query plans are checked with SQLite's EXPLAIN QUERY PLAN",
+)
+
+FIELDS = 20
+SUBTOPICS_PER_FIELD = 20
+CASE_STUDIES_PER_SUBTOPIC = 10
+SESSIONS = 4000
+MESSAGES_PER_SESSION = 10
+START = datetime(2026, 1, 1)
+
+# Tables that grow with usage; reading any of them end to end is a regression
+LARGE_TABLES = ("subtopics", "case_studies", "sessions", "chat_messages")
+FULL_SCAN = re.compile(rf"^SCAN (?:TABLE )?({'|'.join(LARGE_TABLES)})\b")
+
+# Endpoint queries that must be answered from indexes
+ENDPOINTS = {
+    "list_subtopics_by_field": "/subtopics/?field_id=7",
+    "get_subtopic": "/subtopics/123",
+    "list_case_studies_by_subtopic": "/case-studies/?subtopic_id=123",
+    "get_case_study": "/case-studies/2345",
+    "get_case_study_by_slug": "/case-studies/by-slug/case-2345",
+    "list_sessions_by_device": "/sessions/?device_id=device-1728",
+    "get_session": "/sessions/3456",
+    "list_chat_messages": "/sessions/3456/messages",
+    "usage_for_session": "/usage/?group_by=session&session_id=3456",
+    "usage_for_case_study": "/usage/?group_by=route&case_study_id=2345",
+    "usage_for_day": (
+        "/usage/?group_by=day&since=2026-03-01T00:00:00&until=2026-03-02T00:00:00"
+    ),
+}
+
+
+@pytest.fixture
+def large_db(test_db):
+    """Fill the test database with a synthetic catalogue and chat history."""
+    from casebreaker_backend.models import (
+        CaseStudy,
+        ChatMessage,
+        Field,
+        Session,
+        Subtopic,
+    )
+
+    subtopics = FIELDS * SUBTOPICS_PER_FIELD
+    case_studies = subtopics * CASE_STUDIES_PER_SUBTOPIC
+    test_db.execute(
+        insert(Field), [{"id": i, "name": f"Field {i}"} for i in range(1, FIELDS + 1)]
+    )
+    test_db.execute(
+        insert(Subtopic),
+        [
+            {
+                "id": i,
+                "name": f"Subtopic {i}",
+                "field_id": (i - 1) // SUBTOPICS_PER_FIELD + 1,
+            }
+            for i in range(1, subtopics + 1)
+        ],
+    )
+    test_db.execute(
+        insert(CaseStudy),
+        [
+            {
+                "id": i,
+                "title": f"Case {i}",
+                "subtopic_id": (i - 1) // CASE_STUDIES_PER_SUBTOPIC + 1,
+                "difficulty": 3,
+                "learning_objectives": ["objective"],
+                "context_materials": {"background": "Background. " * 20},
+                "checkpoints": [{"id": "1", "title": "Checkpoint"}],
+                "pitfalls": [],
+                "source_type": "GENERATED",
+                "share_slug": f"case-{i}",
+                "estimated_time": 30,
+                "last_updated": START,
+                "created_at": START,
+            }
+            for i in range(1, case_studies + 1)
+        ],
+    )
+    test_db.execute(
+        insert(Session),
+        [
+            {
+                "id": i,
+                "case_study_id": i % case_studies + 1,
+                "device_id": f"device-{i // 2}",
+                "completed_checkpoints": [],
+                "status": "active",
+                "start_time": START,
+            }
+            for i in range(1, SESSIONS + 1)
+        ],
+    )
+    test_db.execute(
+        insert(ChatMessage),
+        [
+            {
+                "session_id": session_id,
+                "role": "user" if turn % 2 == 0 else "assistant",
+                "content": "Message",
+                "timestamp": START + timedelta(hours=session_id // 10, minutes=turn),
+                "status": "complete",
+                "model": None if turn % 2 == 0 else "claude-3-5-haiku-20241022",
+                "idempotency_key": f"key-{session_id}-{turn}" if turn % 2 == 0 else None,
+            }
+            for session_id in range(1, SESSIONS + 1)
+            for turn in range(MESSAGES_PER_SESSION)
+        ],
+    )
+    test_db.commit()
+    test_db.execute(text("ANALYZE"))
+    test_db.commit()
+    return test_db
+
+
+@contextmanager
+def captured_queries(async_test_db):
+    """Collect the statements the API sends to the database."""
+    engine = async_test_db.kw["bind"].sync_engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def full_scans(db, statements):
+    """The EXPLAIN QUERY PLAN steps that read a large table end to end."""
+    scans = []
+    for statement, parameters in statements:
+        plan = db.connection().exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+        for *_, detail in plan:
+            if FULL_SCAN.match(detail):
+                scans.append(f"{detail}: {' '.join(statement.split())}")
+    return scans
+
+
+def test_endpoint_queries_use_indexes(client, large_db, async_test_db):
+    """Test that no endpoint lookup falls back to a full table scan."""
+    regressions = {}
+    for name, path in ENDPOINTS.items():
+        with captured_queries(async_test_db) as statements:
+            response = client.get(f"/api/v1{path}")
+        assert response.status_code == 200, name
+        assert statements, name
+        scans = full_scans(large_db, statements)
+        if scans:
+            regressions[name] = scans
+    assert regressions == {}
+
+
+def test_chat_write_path_queries_use_indexes(large_db, async_test_db):
+    """Test that the lookups made while posting and streaming use indexes."""
+    from casebreaker_backend.routers.sessions import (
+        find_stored_response,
+        get_session_with_case_study,
+        get_unsummarized_history,
+        mark_interrupted_replies,
+        record_completed_checkpoints,
+    )
+
+    async def run():
+        async with async_test_db() as db:
+            session = await get_session_with_case_study(db, 3456)
+            await get_unsummarized_history(db, session)
+            await find_stored_response(db, 3456, "key-3456-4")
+            await record_completed_checkpoints(db, 3456, ["1"])
+            await mark_interrupted_replies(db)
+
+    with captured_queries(async_test_db) as statements:
+        asyncio.run(run())
+    assert len(statements) >= 5
+    assert full_scans(large_db, statements) == []
@@ -0,0 +1,71 @@
+from casebreaker_backend.services.retrieval import (
+    BM25Index,
+    context_cards,
+    select_context,
+)
+
+
+def make_case_study(card_count):
+    topics = ["sepsis", "antibiotics", "fluids", "lactate", "cultures", "imaging"]
+    return {
+        "id": 1,
+        "last_updated": "2026-10-18",
+        "title": "Septic shock",
+        "context_materials": {
+            "cards": [
+                {
+                    "title": f"Card {i}",
+                    "description": f"Notes on {topics[i % len(topics)]} management",
+                }
+                for i in range(card_count)
+            ]
+        },
+        "checkpoints": [
+            {"id": "1", "title": "Recognise sepsis", "description": "Identify sepsis"},
+            {
+                "id": "2",
+                "title": "Start antibiotics",
+                "description": "Choose empirical antibiotics",
+            },
+        ],
+    }
+
+
+def test_bm25_ranks_matching_documents_first():
+    """Test that documents sharing rare query terms rank highest."""
+    index = BM25Index(
+        [
+            "Fluid resuscitation with crystalloids",
+            "Empirical antibiotics within the first hour",
+            "Blood cultures before antibiotics",
+        ]
+    )
+    assert index.top("which antibiotics first", 2) == [1, 2]
+    assert index.top("unrelated words", 2) == [0, 1]
+
+
+def test_context_cards_from_sections():
+    """Test that section-style materials become one card per section."""
+    cards = context_cards({"background": "text", "key_concepts": ["a", "b"]})
+    assert [card["title"] for card in cards] == ["background", "key_concepts"]
+
+
+def test_select_context_drops_completed_checkpoints_and_cards():
+    """Test trimming a large case study to the current checkpoint."""
+    selected = select_context(
+        make_case_study(12), ["1"], "What about antibiotics?", max_cards=3
+    )
+    assert [cp["id"] for cp in selected["checkpoints"]] == ["2"]
+    # Both antibiotics cards, then the first card to fill the remaining slot
+    assert "context_materials" not in selected
+    cards = selected["selected_context"]["cards"]
+    assert [card["title"] for card in cards] == ["Card 0", "Card 1", "Card 7"]
+    assert selected["context_variant"] == (("2",), (0, 1, 7))
+
+
+def test_select_context_keeps_small_case_studies_whole():
+    """Test that case studies within the card limit are sent unchanged."""
+    case_study = make_case_study(4)
+    selected = select_context(case_study, [], "hello", max_cards=6)
+    assert selected["context_materials"] == case_study["context_materials"]
+    assert selected["context_variant"] == (("1", "2"), None)
@@ -0,0 +1,55 @@
+import pytest
+
+from casebreaker_backend.services.routing import ModelRouter, Route, TurnFeatures
+
+RULES = [
+    {"name": "busy", "model": "small", "max_tokens": 256, "when": {"min_queue_length": 10}},
+    {
+        "name": "nudge",
+        "model": "medium",
+        "max_tokens": 512,
+        "when": {"max_message_chars": 50, "max_difficulty": 3},
+    },
+    {"name": "wrap_up", "model": "small", "when": {"max_remaining_checkpoints": 0}},
+]
+
+
+def features(**overrides):
+    values = dict(message_chars=200, difficulty=4, remaining_checkpoints=2, queue_length=0)
+    values.update(overrides)
+    return TurnFeatures(**values)
+
+
+@pytest.fixture
+def router():
+    return ModelRouter(RULES, default=Route("default", "large", 4096))
+
+
+def test_first_matching_rule_wins(router):
+    """Test that rules are tried in order."""
+    assert router.route(features(queue_length=12, message_chars=10)).name == "busy"
+    assert router.route(features(message_chars=10, difficulty=2)) == Route(
+        "nudge", "medium", 512
+    )
+
+
+def test_all_conditions_must_hold(router):
+    """Test that a rule needs every condition to match."""
+    assert router.route(features(message_chars=10, difficulty=5)).name == "default"
+    assert router.route(features(message_chars=10, difficulty=None)).name == "default"
+
+
+def test_rule_without_max_tokens_keeps_default(router):
+    """Test that a rule only switching models keeps the default output budget."""
+    assert router.route(features(remaining_checkpoints=0)) == Route(
+        "wrap_up", "small", 4096
+    )
+
+
+def test_unknown_condition_rejected():
+    """Test that misspelt conditions fail at startup instead of never matching."""
+    with pytest.raises(ValueError):
+        ModelRouter(
+            [{"name": "x", "model": "m", "max_tokens": 1, "when": {"max_chars": 1}}],
+            default=Route("default", "large", 4096),
+        )
@@ -0,0 +1,827 @@
+import json
+import pytest
+from fastapi import status
+
+
+def parse_sse(body):
+    """Split an SSE response body into (event, data) pairs."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.split("\n") if ": " in line)
+        events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+def streamed_text(events):
+    return "".join(data["data"] for event, data in events if event == "chunk")
+
+
+def test_create_chat_message_streams_response(
+    client, sample_session, stream_db, fake_llm
+):
+    """Test that a chat message streams the reply and saves both messages."""
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    assert events[0][0] == "status"
+    assert events[-1][0] == "end"
+    assert streamed_text(events) == "You said: hello"
+
+    response = client.get(f"/api/v1/sessions/{sample_session.id}/messages")
+    messages = response.json()
+    assert [m["role"] for m in messages] == ["user", "assistant"]
+    assert messages[1]["content"] == "You said: hello"
+
+
+def test_create_chat_message_completes_checkpoints(
+    client, sample_session, stream_db, fake_llm
+):
+    """Test that checkpoint markers are stripped and recorded on the session."""
+    from casebreaker_backend.models import Session
+
+    fake_llm.response = "Well done. [CHECKPOINTS_COMPLETED][1]"
+    session_id = sample_session.id
+
+    response = client.post(
+        f"/api/v1/sessions/{session_id}/messages",
+        json={"role": "user", "content": "I think it's sepsis"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert "CHECKPOINTS_COMPLETED" not in response.text
+    events = parse_sse(response.text)
+    assert streamed_text(events) == "Well done. "
+    assert [data["data"] for event, data in events if event == "checkpoint"] == [
+        {"completed": ["1"], "completed_checkpoints": ["1"], "total": 1}
+    ]
+
+    db = stream_db()
+    assert db.get(Session, session_id).completed_checkpoints == ["1"]
+    db.close()
+
+
+def test_admin_command_completes_checkpoint_without_model(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that DEUS-<id> completes a checkpoint without calling the model."""
+    from casebreaker_backend.config import get_settings
+    from casebreaker_backend.models import Session
+
+    monkeypatch.setattr(get_settings(), "ADMIN_COMMANDS", True)
+    session_id = sample_session.id
+
+    def no_stream(*args, **kwargs):
+        raise AssertionError("the model should not be called")
+
+    monkeypatch.setattr(fake_llm, "stream", no_stream)
+    response = client.post(
+        f"/api/v1/sessions/{session_id}/messages",
+        json={"role": "user", "content": "DEUS-1"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [event for event, _ in parse_sse(response.text)] == [
+        "start",
+        "checkpoint",
+        "status",
+        "end",
+    ]
+
+    db = stream_db()
+    assert db.get(Session, session_id).completed_checkpoints == ["1"]
+    db.close()
+
+
+def test_admin_command_unknown_checkpoint(
+    client, sample_session, stream_db, monkeypatch
+):
+    """Test that DEUS-<id> with an id not in the case study is refused."""
+    from casebreaker_backend.config import get_settings
+    from casebreaker_backend.models import ChatMessage, Session
+
+    monkeypatch.setattr(get_settings(), "ADMIN_COMMANDS", True)
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "DEUS-99"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    db = stream_db()
+    assert db.get(Session, sample_session.id).completed_checkpoints == []
+    assert db.query(ChatMessage).count() == 0
+    db.close()
+
+
+def test_admin_command_ignored_when_disabled(
+    client, sample_session, stream_db, fake_llm
+):
+    """Test that DEUS-<id> goes to the model when admin commands are off."""
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "DEUS-1"},
+    )
+    assert streamed_text(parse_sse(response.text)) == "You said: DEUS-1"
+
+
+def test_reply_cut_at_max_tokens_saved_as_truncated(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that a reply stopped by the route's max_tokens is not saved as complete."""
+    from casebreaker_backend.routers import sessions
+    from casebreaker_backend.services.metrics import metrics
+    from casebreaker_backend.services.routing import ModelRouter, Route
+
+    router = ModelRouter(
+        [{"name": "tight", "model": "small", "max_tokens": 2, "when": {}}],
+        default=Route("default", "large", 4096),
+    )
+    monkeypatch.setattr(sessions, "model_router", router)
+    metrics.reset()
+
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello there"},
+    )
+    assert streamed_text(parse_sse(response.text)) == "You said: "
+
+    messages = client.get(f"/api/v1/sessions/{sample_session.id}/messages").json()
+    assert (messages[1]["content"], messages[1]["status"]) == ("You said:", "truncated")
+    assert metrics.counter("chat_replies_max_tokens") == 1
+
+
+def test_assistant_message_saved_while_streaming(
+    sample_session, stream_db, async_test_db
+):
+    """Test that a streaming reply is persisted in batches and then finalized."""
+    import asyncio
+    from casebreaker_backend.models import ChatMessage
+    from casebreaker_backend.routers.sessions import AssistantMessageWriter
+
+    session_id = sample_session.id
+    reader = stream_db()
+
+    async def run():
+        async with async_test_db() as db:
+            writer = AssistantMessageWriter(db, session_id, interval_seconds=60)
+            await writer.append("Hello")
+            await writer.append(" there")
+            # The first text creates the row; later text waits for the next interval
+            saved = (
+                reader.query(ChatMessage)
+                .filter(ChatMessage.session_id == session_id)
+                .one()
+            )
+            assert (saved.content, saved.status) == ("Hello", "streaming")
+            reader.rollback()
+
+            await writer.finish("complete")
+            reader.refresh(saved)
+            assert (saved.content, saved.status) == ("Hello there", "complete")
+
+    asyncio.run(run())
+    reader.close()
+
+
+def test_interrupted_replies_marked_truncated(
+    sample_session, stream_db, async_test_db
+):
+    """Test that replies left streaming by a stopped worker are marked truncated."""
+    import asyncio
+    from casebreaker_backend.models import ChatMessage
+    from casebreaker_backend.routers.sessions import mark_interrupted_replies
+
+    db = stream_db()
+    db.add(
+        ChatMessage(
+            session_id=sample_session.id,
+            role="assistant",
+            content="Half an ans",
+            status="streaming",
+        )
+    )
+    db.commit()
+
+    async def run():
+        async with async_test_db() as async_db:
+            return await mark_interrupted_replies(async_db)
+
+    assert asyncio.run(run()) == 1
+    assert db.query(ChatMessage).one().status == "truncated"
+    db.close()
+
+
+def test_provider_error_sends_one_error_event(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that a failing provider ends the stream with a single error."""
+    from casebreaker_backend.services.events import TextDelta
+
+    async def failing_stream(system, messages, **kwargs):
+        yield TextDelta("Let me ")
+        raise RuntimeError("overloaded")
+
+    monkeypatch.setattr(fake_llm, "stream", failing_stream)
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello"},
+    )
+    errors = [data for event, data in parse_sse(response.text) if event == "error"]
+    assert len(errors) == 1
+    assert errors[0]["data"] == "Error generating response: overloaded"
+
+def test_create_chat_message_session_not_found(client):
+    """Test posting a message to a non-existent session."""
+    response = client.post(
+        "/api/v1/sessions/999/messages", json={"role": "user", "content": "hello"}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_complete_checkpoint(client, sample_session):
+    """Test completing a checkpoint directly."""
+    response = client.post(f"/api/v1/sessions/{sample_session.id}/checkpoints/1")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["completed_checkpoints"] == ["1"]
+
+
+def test_complete_checkpoint_not_found(client, sample_session):
+    """Test completing a checkpoint that is not part of the case study."""
+    response = client.post(f"/api/v1/sessions/{sample_session.id}/checkpoints/42")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_long_session_folds_into_summary(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that older turns are summarized and only recent turns are sent."""
+    from casebreaker_backend.config import get_settings
+    from casebreaker_backend.models import Session
+    from casebreaker_backend.services.metrics import metrics
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "CONTEXT_RECENT_TURNS", 2)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_EVERY_TURNS", 1)
+    session_id = sample_session.id
+    summaries = metrics.counter("summary_calls")
+
+    for turn in range(4):
+        response = client.post(
+            f"/api/v1/sessions/{session_id}/messages",
+            json={"role": "user", "content": f"message {turn}"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+
+    db = stream_db()
+    db_session = db.get(Session, session_id)
+    assert db_session.summary
+    assert db_session.summary_through_id == 4
+    db.close()
+    # Summary calls have no assistant message, so their usage is counted
+    assert metrics.counter("summary_calls") == summaries + 1
+    assert metrics.counter("summary_output_tokens") > 0
+
+    # The next turn sends the summary plus the two most recent turns only
+    seen = []
+    original_stream = fake_llm.stream
+
+    def recording_stream(system, messages, **kwargs):
+        seen.append(messages)
+        return original_stream(system, messages, **kwargs)
+
+    monkeypatch.setattr(fake_llm, "stream", recording_stream)
+    client.post(
+        f"/api/v1/sessions/{session_id}/messages",
+        json={"role": "user", "content": "message 4"},
+    )
+    assert seen[0][0]["content"].startswith("(Summary of our earlier conversation")
+    assert len(seen[0]) == 5
+
+
+def test_summary_waits_for_admission(sample_session, stream_db, fake_llm, monkeypatch):
+    """Test that background summary calls queue for an LLM slot."""
+    import asyncio
+    from casebreaker_backend.config import get_settings
+    from casebreaker_backend.models import ChatMessage, Session
+    from casebreaker_backend.routers import sessions
+    from casebreaker_backend.services.admission import AdmissionController
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "CONTEXT_RECENT_TURNS", 2)
+    monkeypatch.setattr(settings, "CONTEXT_SUMMARY_EVERY_TURNS", 1)
+    session_id = sample_session.id
+    db = stream_db()
+    for turn in range(4):
+        db.add(ChatMessage(session_id=session_id, role="user", content=f"q {turn}"))
+        db.add(ChatMessage(session_id=session_id, role="assistant", content=f"a {turn}"))
+    db.commit()
+
+    async def run():
+        controller = AdmissionController(max_concurrent=1, max_queue=4)
+        monkeypatch.setattr(sessions, "admission_controller", controller)
+        student = controller.enqueue("student")
+        summary = asyncio.create_task(sessions.update_session_summary(session_id))
+        while not controller.queue_length:
+            await asyncio.sleep(0.01)
+        queued_summary = db.get(Session, session_id).summary
+        controller.release(student)
+        await summary
+        return queued_summary
+
+    assert asyncio.run(run()) is None
+    db.expire_all()
+    assert db.get(Session, session_id).summary_through_id == 4
+    db.close()
+
+
+async def post_stream(path, content, headers=(), disconnect_after_chunk=False):
+    """
+    Drive a chat POST at the ASGI level, returning the raw body received.
+
+    With disconnect_after_chunk the client hangs up after the first text chunk.
+    """
+    import asyncio
+    from casebreaker_backend.main import app
+
+    first_chunk = asyncio.Event()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), *headers],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    body = json.dumps({"role": "user", "content": content}).encode()
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+    received = []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        if disconnect_after_chunk:
+            await first_chunk.wait()
+        else:
+            await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        received.append(message.get("body", b""))
+        if b"event: chunk" in message.get("body", b""):
+            first_chunk.set()
+
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    return b"".join(received).decode()
+
+
+async def wait_for_background_tasks():
+    import asyncio
+
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    if pending:
+        await asyncio.wait(pending, timeout=5)
+
+
+def test_client_disconnect_cancels_stream(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that an abandoned stream stops generating and keeps the partial reply."""
+    import asyncio
+    from casebreaker_backend.models import ChatMessage
+    from casebreaker_backend.services.context import estimate_tokens
+    from casebreaker_backend.services.metrics import metrics
+    from casebreaker_backend.services.streams import stream_registry
+
+    monkeypatch.setattr(stream_registry, "grace_seconds", 0)
+    fake_llm.response = "word"
+    fake_llm.output_tokens = 1000
+    fake_llm.tokens_per_second = 100
+    session_id = sample_session.id
+    cancelled = metrics.counter("chat_streams_cancelled")
+
+    async def run():
+        await post_stream(
+            f"/api/v1/sessions/{session_id}/messages",
+            "hello",
+            disconnect_after_chunk=True,
+        )
+        await wait_for_background_tasks()
+
+    asyncio.run(run())
+
+    db = stream_db()
+    reply = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == session_id, ChatMessage.role == "assistant")
+        .one()
+    )
+    assert reply.status == "truncated"
+    assert 0 < len(reply.content.split()) < 1000
+    # No final usage event arrived, so the output is estimated from the text
+    assert reply.output_tokens == estimate_tokens(reply.content)
+    assert metrics.counter("chat_streams_cancelled") == cancelled + 1
+    db.close()
+
+
+def test_reconnect_with_last_event_id_resumes_stream(
+    client, sample_session, stream_db, fake_llm
+):
+    """Test that a reconnect replays missed events instead of regenerating."""
+    import asyncio
+    from casebreaker_backend.models import ChatMessage
+
+    fake_llm.response = "word"
+    fake_llm.output_tokens = 20
+    fake_llm.tokens_per_second = 200
+    path = f"/api/v1/sessions/{sample_session.id}/messages"
+
+    async def run():
+        first = await post_stream(path, "hello", disconnect_after_chunk=True)
+        last_id = [line[4:] for line in first.split("\n") if line.startswith("id: ")][-1]
+        second = await post_stream(
+            path, "hello", headers=[(b"last-event-id", last_id.encode())]
+        )
+        return first, second
+
+    first, second = asyncio.run(run())
+    text = streamed_text(parse_sse(first)) + streamed_text(parse_sse(second))
+    assert text == "word " * 20
+    assert parse_sse(second)[-1][0] == "end"
+
+    db = stream_db()
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == sample_session.id)
+        .order_by(ChatMessage.id)
+    )
+    assert [m.role for m in messages] == ["user", "assistant"]
+    db.close()
+
+
+def test_reconnect_with_unknown_last_event_id(client, sample_session):
+    """Test that an unknown Last-Event-ID is refused rather than regenerated."""
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello"},
+        headers={"Last-Event-ID": f"{sample_session.id}-999:3"},
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_idempotency_key_replays_stored_response(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that a retried Idempotency-Key returns the saved reply."""
+    from casebreaker_backend.models import ChatMessage
+    from casebreaker_backend.routers import sessions
+    from casebreaker_backend.services.streams import StreamRegistry
+
+    path = f"/api/v1/sessions/{sample_session.id}/messages"
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post(path, json={"role": "user", "content": "hello"}, headers=headers)
+
+    # Forget the in-memory stream so the retry has to come from the database
+    monkeypatch.setattr(sessions, "stream_registry", StreamRegistry())
+    retry = client.post(path, json={"role": "user", "content": "hello"}, headers=headers)
+    assert retry.status_code == status.HTTP_200_OK
+    assert streamed_text(parse_sse(retry.text)) == streamed_text(parse_sse(first.text))
+
+    db = stream_db()
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == sample_session.id)
+        .order_by(ChatMessage.id)
+    )
+    assert [m.role for m in messages] == ["user", "assistant"]
+    db.close()
+
+
+def test_concurrent_identical_posts_share_one_generation(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that identical posts in flight together make one upstream call."""
+    import asyncio
+    from casebreaker_backend.models import ChatMessage
+
+    fake_llm.tokens_per_second = 100
+    calls = []
+    original_stream = fake_llm.stream
+
+    def counting_stream(system, messages, **kwargs):
+        calls.append(messages)
+        return original_stream(system, messages, **kwargs)
+
+    monkeypatch.setattr(fake_llm, "stream", counting_stream)
+    path = f"/api/v1/sessions/{sample_session.id}/messages"
+
+    async def run():
+        return await asyncio.gather(
+            post_stream(path, "hello"), post_stream(path, "hello")
+        )
+
+    first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert streamed_text(parse_sse(first)) == "You said: hello"
+    assert streamed_text(parse_sse(second)) == "You said: hello"
+
+    db = stream_db()
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.session_id == sample_session.id)
+        .order_by(ChatMessage.id)
+    )
+    assert [m.role for m in messages] == ["user", "assistant"]
+    db.close()
+
+
+def test_retry_after_stream_outgrew_buffer(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that a retry never attaches to a stream it cannot replay in full."""
+    import asyncio
+    from casebreaker_backend.config import get_settings
+    from casebreaker_backend.routers import sessions
+
+    # One frame per token, so the stream outgrows the buffer early
+    monkeypatch.setattr(get_settings(), "SSE_COALESCE_MS", 0)
+    registry = sessions.stream_registry
+    monkeypatch.setattr(registry, "buffer_size", 4)
+    fake_llm.response = "word"
+    fake_llm.output_tokens = 40
+    fake_llm.tokens_per_second = 200
+    path = f"/api/v1/sessions/{sample_session.id}/messages"
+    headers = [(b"idempotency-key", b"long-1")]
+
+    async def run():
+        first = asyncio.create_task(post_stream(path, "hello", headers=headers))
+        while True:
+            stream = registry.find(sample_session.id, "long-1")
+            if stream is not None and stream.last_seq > 10:
+                break
+            await asyncio.sleep(0.01)
+        in_flight = await post_stream(path, "hello", headers=headers)
+        first = await first
+        after = await post_stream(path, "hello", headers=headers)
+        return first, in_flight, after
+
+    first, in_flight, after = asyncio.run(run())
+    assert streamed_text(parse_sse(first)) == "word " * 40
+    assert "still being answered" in in_flight
+    assert streamed_text(parse_sse(after)) == ("word " * 40).strip()
+
+
+def test_idempotency_key_race_with_another_worker(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that a key already saved by another worker replays its reply."""
+    from casebreaker_backend.models import ChatMessage
+    from casebreaker_backend.routers import sessions
+
+    db = stream_db()
+    db.add_all(
+        [
+            ChatMessage(
+                session_id=sample_session.id,
+                role="user",
+                content="hello",
+                idempotency_key="race-1",
+            ),
+            ChatMessage(session_id=sample_session.id, role="assistant", content="Hi!"),
+        ]
+    )
+    db.commit()
+
+    # The other worker saves the message after this one has looked for it
+    find_stored_response = sessions.find_stored_response
+    lookups = []
+
+    async def find_after_race(db, session_id, idempotency_key):
+        lookups.append(idempotency_key)
+        if len(lookups) == 1:
+            return None
+        return await find_stored_response(db, session_id, idempotency_key)
+
+    monkeypatch.setattr(sessions, "find_stored_response", find_after_race)
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello"},
+        headers={"Idempotency-Key": "race-1"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert streamed_text(parse_sse(response.text)) == "Hi!"
+    assert len(lookups) == 2
+    assert db.query(ChatMessage).count() == 2
+    db.close()
+
+
+def test_opening_message_is_cached_per_case_study(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that the opening message is generated once and then served cached."""
+    from datetime import datetime
+    from casebreaker_backend.models import CaseStudy, ChatMessage, Session
+
+    fake_llm.response = "Welcome! What stands out to you first?"
+    session_id = sample_session.id
+    case_study_id = sample_session.case_study_id
+    response = client.post(f"/api/v1/sessions/{session_id}/opening")
+    assert response.status_code == status.HTTP_200_OK
+    assert streamed_text(parse_sse(response.text)) == fake_llm.response
+
+    calls = []
+    original_stream = fake_llm.stream
+
+    def counting_stream(system, messages, **kwargs):
+        calls.append(messages)
+        return original_stream(system, messages, **kwargs)
+
+    monkeypatch.setattr(fake_llm, "stream", counting_stream)
+
+    db = stream_db()
+    second = Session(case_study_id=case_study_id, device_id="other", completed_checkpoints=[])
+    db.add(second)
+    db.commit()
+    response = client.post(f"/api/v1/sessions/{second.id}/opening")
+    assert streamed_text(parse_sse(response.text)) == fake_llm.response
+    assert calls == []
+    saved = db.query(ChatMessage).filter(ChatMessage.session_id == second.id).one()
+    assert saved.role == "assistant"
+
+    # Editing the case study invalidates its openings
+    db.get(CaseStudy, case_study_id).last_updated = datetime.utcnow()
+    third = Session(case_study_id=case_study_id, device_id="third", completed_checkpoints=[])
+    db.add(third)
+    db.commit()
+    client.post(f"/api/v1/sessions/{third.id}/opening")
+    assert len(calls) == 1
+    db.close()
+
+
+def test_opening_message_stays_in_context(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that the next turn sends the opening question to the model."""
+    fake_llm.response = "Welcome! What could cause this rash?"
+    session_id = sample_session.id
+    client.post(f"/api/v1/sessions/{session_id}/opening")
+
+    seen = []
+    original_stream = fake_llm.stream
+
+    def recording_stream(system, messages, **kwargs):
+        seen.append(messages)
+        return original_stream(system, messages, **kwargs)
+
+    monkeypatch.setattr(fake_llm, "stream", recording_stream)
+    client.post(
+        f"/api/v1/sessions/{session_id}/messages",
+        json={"role": "user", "content": "Measles?"},
+    )
+    assert [msg["role"] for msg in seen[0]] == ["user", "assistant", "user"]
+    assert seen[0][1]["content"] == "Welcome! What could cause this rash?"
+    assert seen[0][2]["content"] == "Measles?"
+
+
+def test_opening_message_after_conversation_started(
+    client, sample_session, sample_chat_message
+):
+    """Test that a session with messages gets no opening message."""
+    response = client.post(f"/api/v1/sessions/{sample_session.id}/opening")
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_progress_subscription_pushes_checkpoint_changes(
+    client, sample_session, stream_db
+):
+    """Test that progress subscribers get a snapshot and then each change."""
+    import asyncio
+    from casebreaker_backend.main import app
+
+    session_id = sample_session.id
+    path = f"/api/v1/sessions/{session_id}/progress"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def run():
+        frames = []
+        got_frame = asyncio.Event()
+        done = asyncio.Event()
+
+        async def receive():
+            await done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message.get("body"):
+                frames.append(message["body"].decode())
+                got_frame.set()
+                if len(frames) == 2:
+                    done.set()
+
+        task = asyncio.create_task(app(scope, receive, send))
+        await asyncio.wait_for(got_frame.wait(), timeout=5)
+        # TestClient runs each request on its own event loop, so post from a
+        # worker thread while this loop keeps serving the subscription
+        await asyncio.to_thread(
+            client.post, f"/api/v1/sessions/{session_id}/checkpoints/1"
+        )
+        await asyncio.wait_for(task, timeout=5)
+        return "".join(frames)
+
+    events = parse_sse(asyncio.run(run()))
+    assert [event for event, _ in events] == ["progress", "progress"]
+    assert events[0][1]["data"]["completed_checkpoints"] == []
+    assert events[1][1]["data"] == {
+        "session_id": session_id,
+        "completed": ["1"],
+        "completed_checkpoints": ["1"],
+        "total": 1,
+    }
+
+
+def test_device_progress_subscription_snapshot(client, sample_session, stream_db):
+    """Test that a device subscription starts with each session's progress."""
+    import asyncio
+    from casebreaker_backend.main import app
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/sessions/progress",
+        "raw_path": b"/api/v1/sessions/progress",
+        "query_string": f"device_id={sample_session.device_id}".encode(),
+        "root_path": "",
+        "headers": [],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+
+    async def run():
+        frames = []
+        got_frame = asyncio.Event()
+
+        async def receive():
+            await got_frame.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message.get("body"):
+                frames.append(message["body"].decode())
+                got_frame.set()
+
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        return "".join(frames)
+
+    [(event, data)] = parse_sse(asyncio.run(run()))
+    assert event == "progress"
+    assert data["data"]["session_id"] == sample_session.id
+    assert data["data"]["total"] == 1
+
+
+def test_progress_subscription_session_not_found(client):
+    """Test subscribing to progress of a non-existent session."""
+    response = client.get("/api/v1/sessions/999/progress")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_create_chat_message_shed_when_queue_full(
+    client, sample_session, stream_db, fake_llm, monkeypatch
+):
+    """Test that messages are rejected with 429 when the LLM queue is full."""
+    from casebreaker_backend.routers import sessions
+    from casebreaker_backend.services.admission import AdmissionController
+
+    monkeypatch.setattr(
+        sessions,
+        "admission_controller",
+        AdmissionController(max_concurrent=0, max_queue=0),
+    )
+    response = client.post(
+        f"/api/v1/sessions/{sample_session.id}/messages",
+        json={"role": "user", "content": "hello"},
+    )
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert "try again" in response.json()["detail"]
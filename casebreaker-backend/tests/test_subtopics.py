@@ -35,6 +35,69 @@ def test_list_subtopics_with_case_count(client, sample_subtopic, sample_case_stu
     assert len(data) == 1
     assert data[0]["case_count"] == 1
 
+def test_case_count_follows_case_study_writes(client, test_db, sample_subtopic):
+    """Test that the stored case_count changes as case studies are added and removed."""
+    from casebreaker_backend.models import CaseStudy
+
+    cases = [
+        CaseStudy(title=f"Case {i}", subtopic_id=sample_subtopic.id, share_slug=f"c{i}")
+        for i in range(3)
+    ]
+    test_db.add_all(cases)
+    test_db.commit()
+    response = client.delete(f"/api/v1/case-studies/{cases[0].id}")
+    assert response.status_code == status.HTTP_200_OK
+
+    test_db.refresh(sample_subtopic)
+    assert sample_subtopic.case_count == 2
+    response = client.get(f"/api/v1/subtopics/{sample_subtopic.id}")
+    assert response.json()["case_count"] == 2
+
+def test_case_count_follows_moved_case_study(test_db, sample_subtopic, sample_case_study):
+    """Test that moving a case study moves it between the subtopics' counts."""
+    from casebreaker_backend.models import Subtopic
+
+    other = Subtopic(name="Other", field_id=sample_subtopic.field_id)
+    test_db.add(other)
+    test_db.commit()
+
+    # The commit expired subtopic_id, so the flush has no loaded old value
+    sample_case_study.subtopic_id = other.id
+    test_db.commit()
+    test_db.refresh(sample_subtopic)
+    test_db.refresh(other)
+    assert (sample_subtopic.case_count, other.case_count) == (0, 1)
+
+    sample_case_study.subtopic = sample_subtopic
+    test_db.commit()
+    test_db.refresh(sample_subtopic)
+    test_db.refresh(other)
+    assert (sample_subtopic.case_count, other.case_count) == (1, 0)
+
+def test_list_subtopics_does_not_read_case_studies(
+    client, sample_subtopic, sample_case_study, async_test_db
+):
+    """Test that listing subtopics uses the stored count instead of case_studies."""
+    from .test_query_plans import captured_queries
+
+    with captured_queries(async_test_db) as statements:
+        response = client.get("/api/v1/subtopics/")
+    assert response.json()[0]["case_count"] == 1
+    assert statements
+    assert not [sql for sql, _ in statements if "case_studies" in sql]
+
+def test_repair_case_counts(test_db, sample_subtopic, sample_case_study):
+    """Test that the repair command fixes counts that drifted."""
+    from sqlalchemy import text
+    from repair_case_counts import repair_case_counts
+
+    test_db.execute(text("UPDATE subtopics SET case_count = 7"))
+    test_db.commit()
+    assert repair_case_counts(test_db) == 1
+    test_db.refresh(sample_subtopic)
+    assert sample_subtopic.case_count == 1
+    assert repair_case_counts(test_db) == 0
+
 def test_get_subtopic(client, sample_subtopic):
     """Test getting a specific subtopic by ID."""
     response = client.get(f"/api/v1/subtopics/{sample_subtopic.id}")
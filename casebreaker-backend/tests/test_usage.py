@@ -0,0 +1,133 @@
+from datetime import datetime
+
+from fastapi import status
+
+from casebreaker_backend.services.events import UsageEvent
+from casebreaker_backend.services.usage import UsageTotals, estimate_cost
+
+
+def test_usage_totals_merge_running_counts():
+    """Test merging message_start and message_delta style usage events."""
+    usage = UsageTotals()
+    usage.add(UsageEvent(input_tokens=1200, output_tokens=1, cache_read_input_tokens=1000))
+    usage.add(UsageEvent(output_tokens=40))
+    usage.add(UsageEvent(output_tokens=85))
+    assert usage == UsageTotals(
+        input_tokens=1200, output_tokens=85, cache_read_input_tokens=1000
+    )
+
+
+def test_estimate_cost():
+    """Test pricing tokens at the model's list prices."""
+    cost = estimate_cost("claude-3-haiku-20240307", 1_000_000, 1_000_000, 0, 1_000_000)
+    assert cost == 0.25 + 1.25 + 0.03
+    assert estimate_cost("unknown-model", 100, 100) is None
+
+
+def test_usage_ledger_per_session(client, sample_session, stream_db, fake_llm):
+    """Test that replies record usage and the ledger aggregates it."""
+    from casebreaker_backend.models import ChatMessage
+
+    session_id = sample_session.id
+    case_study_id = sample_session.case_study_id
+    for content in ("hello", "and again"):
+        client.post(
+            f"/api/v1/sessions/{session_id}/messages",
+            json={"role": "user", "content": content},
+        )
+
+    db = stream_db()
+    replies = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.role == "assistant")
+        .order_by(ChatMessage.id)
+        .all()
+    )
+    assert [reply.output_tokens for reply in replies] == [3, 4]
+    assert all(reply.input_tokens > 0 for reply in replies)
+    assert all(reply.ttft_ms is not None for reply in replies)
+    model = replies[0].model
+    db.close()
+
+    response = client.get("/api/v1/usage/", params={"group_by": "session"})
+    assert response.status_code == status.HTTP_200_OK
+    [summary] = response.json()
+    assert summary["key"] == session_id
+    assert summary["messages"] == 2
+    assert summary["models"] == [model]
+    assert summary["output_tokens"] == 7
+    assert summary["cost_usd"] > 0
+
+    response = client.get(
+        "/api/v1/usage/",
+        params={"group_by": "case_study", "case_study_id": case_study_id},
+    )
+    assert [summary["key"] for summary in response.json()] == [case_study_id]
+    response = client.get(
+        "/api/v1/usage/", params={"group_by": "case_study", "case_study_id": 999}
+    )
+    assert response.json() == []
+    response = client.get("/api/v1/usage/", params={"group_by": "route"})
+    assert [summary["key"] for summary in response.json()] == ["short_nudge"]
+    response = client.get("/api/v1/usage/", params={"group_by": "day"})
+    assert response.status_code == 200
+    assert [summary["key"] for summary in response.json()] == [
+        datetime.utcnow().date().isoformat()
+    ]
+
+
+def test_opening_message_records_usage(client, sample_session, stream_db, fake_llm):
+    """Test that a generated opening carries its ledger and a cached one none."""
+    from casebreaker_backend.models import ChatMessage, Session
+
+    client.post(f"/api/v1/sessions/{sample_session.id}/opening")
+    db = stream_db()
+    other = Session(
+        case_study_id=sample_session.case_study_id,
+        device_id="other",
+        completed_checkpoints=[],
+    )
+    db.add(other)
+    db.commit()
+    client.post(f"/api/v1/sessions/{other.id}/opening")
+
+    generated, cached = db.query(ChatMessage).order_by(ChatMessage.session_id)
+    assert generated.route == "opening"
+    assert generated.model is not None
+    assert generated.input_tokens > 0 and generated.output_tokens > 0
+    assert generated.ttft_ms is not None
+    assert cached.model is None and cached.output_tokens is None
+    db.close()
+
+    response = client.get("/api/v1/usage/", params={"group_by": "route"})
+    [summary] = response.json()
+    assert summary["key"] == "opening"
+    assert summary["messages"] == 1
+
+
+def test_prewarm_and_summary_usage_recorded(
+    client, sample_case_study, fake_llm, prewarm_enabled
+):
+    """Test that LLM calls with no assistant message still record usage."""
+    import asyncio
+    from casebreaker_backend.services.metrics import metrics
+    from casebreaker_backend.services.context import summarize_messages
+
+    calls = metrics.counter("opening_prewarm_calls")
+    tokens = metrics.counter("opening_prewarm_output_tokens")
+    client.post("/api/v1/case-studies/openings/prewarm")
+    assert metrics.counter("opening_prewarm_calls") == calls + 1
+    assert metrics.counter("opening_prewarm_output_tokens") > tokens
+
+    usage = UsageTotals()
+    asyncio.run(
+        summarize_messages(
+            fake_llm,
+            None,
+            [{"role": "user", "content": "hello"}],
+            model="claude-3-5-haiku-20241022",
+            max_tokens=100,
+            usage=usage,
+        )
+    )
+    assert usage.input_tokens > 0 and usage.output_tokens > 0
@@ -1,6 +1,6 @@
 'use client';
 
-import { useCallback, useEffect, useRef, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Message } from './Message';
 import { Input } from './Input';
 import { useChat } from '@/hooks/useChat';
@@ -21,19 +21,11 @@ export function Chat({ sessionId, initialMessage }: ChatProps) {
   const [caseStudy, setCaseStudy] = useState<CaseStudy | null>(null);
   const [completedCheckpoints, setCompletedCheckpoints] = useState<string[]>([]);
 
-  const updateSessionData = useCallback(async () => {
-    try {
-      const session = await api.getSession(sessionId);
-      setCompletedCheckpoints(session.completed_checkpoints || []);
-    } catch (error) {
-      console.error('Failed to fetch session:', error);
-    }
-  }, [sessionId]);
-
+  // Progress arrives on the chat stream, no need to refetch the session
   const { messages, isLoading, error, sendMessage } = useChat({
     sessionId,
     initialMessage,
-    onResponseComplete: updateSessionData,
+    onCheckpoint: setCompletedCheckpoints,
   });
 
   const messagesEndRef = useRef<HTMLDivElement>(null);
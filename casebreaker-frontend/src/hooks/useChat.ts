@@ -6,9 +6,10 @@ export interface UseChatOptions {
   sessionId: number;
   initialMessage?: string;
   onResponseComplete?: () => void;
+  onCheckpoint?: (completedCheckpoints: string[]) => void;
 }
 
-export function useChat({ sessionId, initialMessage, onResponseComplete }: UseChatOptions) {
+export function useChat({ sessionId, initialMessage, onResponseComplete, onCheckpoint }: UseChatOptions) {
   const [messages, setMessages] = useState<ChatMessage[]>([]);
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -122,6 +123,10 @@ export function useChat({ sessionId, initialMessage, onResponseComplete }: UseCh
                     });
                     break;
                     
+                  case 'checkpoint':
+                    onCheckpoint?.(data.data.completed_checkpoints);
+                    break;
+
                   case 'error':
                     setError(data.data);
                     setIsLoading(false);
@@ -146,7 +151,7 @@ export function useChat({ sessionId, initialMessage, onResponseComplete }: UseCh
     } finally {
       setIsLoading(false);
     }
-  }, [sessionId]);
+  }, [sessionId, onResponseComplete, onCheckpoint]);
 
   return {
     messages,
@@ -181,6 +181,8 @@ export class ApiClient {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          // Same key on every retry so the server doesn't generate twice
+          'Idempotency-Key': crypto.randomUUID(),
         },
         body: JSON.stringify({
           role: 'user',